@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+STEAM_API_DIRECTORY = os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), "SteamAPI")
+
+
+# Start the Steam stand-in in its own process so it does not share the GIL with the crawler
+def start_stand_in(args):
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIRECTORY, "steam_stand_in.py"),
+        "--port", "0",
+        "--apps", str(args.games),
+        "--latency", str(args.latency),
+        "--throttle-rate", str(args.throttle_rate),
+        "--malformed-rate", str(args.malformed_rate),
+        "--invalid-rate", str(args.invalid_rate),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.kill()
+        raise RuntimeError("Steam stand-in did not start")
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+# I/O counters of the current process, empty where /proc is not available
+def read_io_counters():
+    try:
+        with open("/proc/self/io", 'r') as file:
+            return {name: int(value) for name, value in (line.split(": ") for line in file)}
+    except OSError:
+        return {}
+
+
+# Peak resident set size of the current process in bytes
+def peak_rss():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+# Sum of the crawler's telemetry counters whose names end with the suffix, e.g. "_429" over all endpoints
+def sum_counters(counters, suffix):
+    return sum(value for name, value in counters.items() if name.endswith(suffix))
+
+
+# Crawl every app of the stand-in with an empty catalog and return the number of games processed
+# and the crawler's telemetry counters
+def run_crawl(args, base_url):
+    sys.path.insert(0, STEAM_API_DIRECTORY)
+    import SteamAPI
+
+    SteamAPI.STEAM_STORE_URL = base_url
+    SteamAPI.STEAM_API_URL = base_url
+    SteamAPI.STEAMSPY_URL = base_url
+
+    if args.mode == "process":
+        # Serial per-game path of the threaded crawler, one process_game call after another without a pool
+        session = SteamAPI.create_session_with_retries()
+        appids = [int(game['appid']) for game in SteamAPI.get_all_games()]
+        for appid in appids:
+            SteamAPI.process_game(appid, session, "benchmark")
+        SteamAPI.merge_batch()
+        SteamAPI.CATALOG_MERGER.finalize()
+        return len(appids), SteamAPI.TELEMETRY.snapshot()["counters"]
+
+    SteamAPI.main("benchmark", args.mode == "async", args.steam_concurrency, args.steamspy_concurrency,
+                  args.steam_rate, args.steamspy_rate)
+    return args.games, SteamAPI.TELEMETRY.snapshot()["counters"]
+
+
+def main(args):
+    stand_in, base_url = start_stand_in(args)
+    work_directory = tempfile.mkdtemp(prefix="crawler_benchmark_")
+    previous_directory = os.getcwd()
+    try:
+        # The crawler uses paths relative to the Project directory, run it against an empty catalog
+        os.chdir(work_directory)
+        os.makedirs("SteamAPI/JSON")
+        for name in ("detailed_games_actual.json", "invalid_games_actual.json"):
+            with open(os.path.join("SteamAPI/JSON", name), 'w', encoding='utf-8') as file:
+                json.dump([], file)
+
+        io_before = read_io_counters()
+        started = time.perf_counter()
+        games, counters = run_crawl(args, base_url)
+        elapsed = time.perf_counter() - started
+        io_after = read_io_counters()
+    finally:
+        os.chdir(previous_directory)
+        stand_in.terminate()
+        stand_in.wait()
+        if not args.keep:
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+    results = {
+        "mode": args.mode,
+        "games": games,
+        "elapsed_seconds": round(elapsed, 3),
+        "games_per_second": round(games / elapsed, 3) if elapsed > 0 else 0.0,
+        "peak_rss_bytes": peak_rss(),
+        "disk_bytes_written": io_after.get("write_bytes", 0) - io_before.get("write_bytes", 0),
+        "bytes_written": io_after.get("wchar", 0) - io_before.get("wchar", 0),
+        "throttled_responses": sum_counters(counters, "_429"),
+        "retries": sum_counters(counters, "_retries"),
+    }
+    if args.keep:
+        results["work_directory"] = work_directory
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure crawler throughput against a local Steam stand-in.")
+    parser.add_argument("--mode", choices=("thread", "async", "process"), default="thread",
+                        help="thread batches or asyncio pipeline of SteamAPI.main, or sequential process_game calls")
+    parser.add_argument("--games", type=int, default=500, help="number of apps served by the stand-in")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of appdetails answered with 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.05,
+                        help="share of appdetails bodies with raw control characters")
+    parser.add_argument("--invalid-rate", type=float, default=0.1, help="share of apps without store data")
+    parser.add_argument("--steam-concurrency", type=int, default=8)
+    parser.add_argument("--steamspy-concurrency", type=int, default=4)
+    parser.add_argument("--steam-rate", type=float, default=1000.0, help="Steam requests per second in async mode")
+    parser.add_argument("--steamspy-rate", type=float, default=1000.0,
+                        help="SteamSpy requests per second in async mode")
+    parser.add_argument("--min-games-per-second", type=float, default=0.0,
+                        help="exit with status 1 when the throughput is below this value")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary crawl directory")
+    args = parser.parse_args()
+
+    results = main(args)
+    print(json.dumps(results, indent=4))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+    # Injected 429s that never reach get_with_backoff mean a lower layer is retrying them behind its back
+    if args.throttle_rate > 0 and results["throttled_responses"] == 0:
+        print(f"No 429 responses were counted although --throttle-rate is {args.throttle_rate}.")
+        sys.exit(1)
+    if results["games_per_second"] < args.min_games_per_second:
+        print(f"Throughput {results['games_per_second']} games/sec is below {args.min_games_per_second}.")
+        sys.exit(1)
@@ -0,0 +1,79 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), "SteamAPI"))
+
+# Ways of holding the catalog in memory that are compared
+MODES = ("dict", "record", "catalog", "snapshot")
+
+
+# Current resident set size of this process in bytes
+def current_rss():
+    with open("/proc/self/statm", 'r') as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# Load the catalog in one of the modes and report the memory it holds, run in a fresh process per mode
+def measure(mode, catalog_path, snapshot_path):
+    from catalog_snapshot import load_snapshot
+    from game_catalog import GameCatalog
+    from game_record import load_records
+
+    gc.collect()
+    before = current_rss()
+    started = time.perf_counter()
+    if mode == "snapshot":
+        games = load_snapshot(snapshot_path, catalog_path)
+    else:
+        with open(catalog_path, 'r', encoding='utf-8') as file:
+            if mode == "dict":
+                games = json.load(file)
+            else:
+                games = load_records(file)
+        if mode == "catalog":
+            games = GameCatalog(games)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    return {
+        "mode": mode,
+        "games": len(games),
+        "load_seconds": round(elapsed, 2),
+        "rss_delta_bytes": current_rss() - before,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory held by the in-memory catalog representations.")
+    parser.add_argument("--catalog", default="SteamAPI/JSON/detailed_games_transformed.json")
+    parser.add_argument("--snapshot", default="SteamAPI/JSON/detailed_games_snapshot.bin")
+    parser.add_argument("--mode", choices=MODES, help="measure a single mode in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.catalog, args.snapshot)))
+        sys.exit(0)
+
+    from catalog_snapshot import load_snapshot, write_snapshot
+    from game_catalog import GameCatalog
+    from game_record import load_records
+    if load_snapshot(args.snapshot, args.catalog) is None:
+        with open(args.catalog, 'r', encoding='utf-8') as file:
+            write_snapshot(GameCatalog(load_records(file)), args.snapshot, args.catalog)
+
+    results = []
+    for mode in MODES:
+        output = subprocess.run([sys.executable, __file__, "--catalog", args.catalog, "--snapshot", args.snapshot,
+                                 "--mode", mode],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    baseline = results[0]["rss_delta_bytes"]
+    for result in results:
+        share = result["rss_delta_bytes"] / baseline * 100 if baseline else 0.0
+        print(f"{result['mode']:8} {result['games']} games  {result['rss_delta_bytes'] / 2 ** 20:8.1f} MiB "
+              f"({share:5.1f}% of dict)  loaded in {result['load_seconds']}s")
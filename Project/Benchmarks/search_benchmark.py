@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+import time
+from difflib import SequenceMatcher
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), "SteamAPI"))
+
+from name_index import NameIndex
+
+DEFAULT_QUERIES = ["counter strike", "dota", "witcher 3", "stardew valey", "portal", "half life", "terraria",
+                   "the", "a", "simulator", "dark souls", "grand theft auto", "civilization vi", "minecraft"]
+
+
+# Linear scan the name index replaced, used to check that the results did not change
+def linear_search(game_name, database):
+    results = {}
+    search_query = game_name.lower().replace(" ", "")
+    for game_id, game_data in database.items():
+        name = game_data["Name"].lower().replace(" ", "")
+        ratio = SequenceMatcher(None, search_query, name).ratio()
+        if ratio > 0.7 or search_query in name:
+            total_reviews = game_data["PositiveReviews"] + game_data["NegativeReviews"]
+            results[game_id] = (game_data, total_reviews)
+    return sorted(results.items(), key=lambda x: x[1][1], reverse=True)[:10]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure name search on the transformed catalog.")
+    parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES)
+    parser.add_argument("--catalog", default="SteamAPI/JSON/detailed_games_transformed.json")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every query")
+    parser.add_argument("--compare", action="store_true", help="also run the linear scan and compare the results")
+    args = parser.parse_args()
+
+    with open(args.catalog, 'r', encoding='utf-8') as file:
+        database = json.load(file)
+    started = time.perf_counter()
+    name_index = NameIndex(database)
+    print(f"{len(database)} games, index built in {time.perf_counter() - started:.2f}s")
+
+    timings = []
+    for query in args.queries:
+        durations = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results = name_index.search(query)
+            durations.append(time.perf_counter() - started)
+        timings.append(min(durations))
+        line = f"{query!r:24} {min(durations) * 1000:8.2f}ms {len(results):3} results"
+        if args.compare:
+            started = time.perf_counter()
+            expected = linear_search(query, database)
+            line += f"  linear {(time.perf_counter() - started) * 1000:8.1f}ms " \
+                    f"same={[game_id for game_id, _ in results] == [game_id for game_id, _ in expected]}"
+        print(line)
+
+    timings.sort()
+    print(f"median {timings[len(timings) // 2] * 1000:.2f}ms, max {timings[-1] * 1000:.2f}ms")
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Recorded response payloads replayed by the stand-in
+PAYLOADS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+
+
+# Load a payload file from the payloads directory
+def load_payload(name):
+    with open(os.path.join(PAYLOADS_DIRECTORY, name), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+# Local stand-in for the Steam store, Steam Web API and SteamSpy endpoints used by the crawler
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, app_count=1000, latency=0.0, throttle_rate=0.0, malformed_rate=0.0,
+                 invalid_rate=0.1, seed=0):
+        super().__init__(address, StandInHandler)
+        self.app_count = app_count
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.appdetails = load_payload("appdetails.json")
+        self.steamspy = load_payload("steamspy_appdetails.json")
+        self.requests = 0
+        self.throttled = 0
+
+    # Draw a random number shared by all handler threads
+    def roll(self):
+        with self.random_lock:
+            return self.random.random()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/ISteamApps/GetAppList/v2":
+            apps = [{"appid": appid, "name": f"Sample Game {appid}"} for appid in range(1, server.app_count + 1)]
+            self.send_json({"applist": {"apps": apps}})
+        elif url.path == "/api/appdetails":
+            if server.roll() < server.throttle_rate:
+                server.throttled += 1
+                self.send_body(429, b"", {"Retry-After": "1"})
+                return
+            appid = query.get("appids", ["0"])[0]
+            self.send_appdetails(appid)
+        elif url.path == "/api.php":
+            appid = query.get("appid", ["0"])[0]
+            payload = dict(server.steamspy, appid=int(appid), name=f"Sample Game {appid}")
+            self.send_json(payload)
+        else:
+            self.send_body(404, b"Not found")
+
+    # Store appdetails response, some games are invalid and some bodies contain raw control characters
+    def send_appdetails(self, appid):
+        server = self.server
+        if server.roll() < server.invalid_rate:
+            self.send_json({appid: {"success": False}})
+            return
+        data = dict(server.appdetails, steam_appid=int(appid), name=f"Sample Game {appid}")
+        body = json.dumps({appid: {"success": True, "data": data}}, ensure_ascii=False)
+        if server.roll() < server.malformed_rate:
+            # Raw control characters inside strings, as occasionally returned by the store
+            body = body.replace("Craft a unique deck", "Craft a\x01 unique\x1f deck")
+        self.send_body(200, body.encode('utf-8'), {"Content-Type": "application/json"})
+
+    def send_json(self, payload):
+        self.send_body(200, json.dumps(payload).encode('utf-8'), {"Content-Type": "application/json"})
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Start the stand-in on a background thread and return the server
+def start_stand_in(port=0, **options):
+    server = StandInServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, name="steam-stand-in", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded Steam and SteamSpy payloads locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--apps", type=int, default=1000, help="number of apps in GetAppList")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of appdetails answered with 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="share of appdetails bodies with raw control characters")
+    parser.add_argument("--invalid-rate", type=float, default=0.1, help="share of apps without store data")
+    args = parser.parse_args()
+
+    server = StandInServer(("127.0.0.1", args.port), args.apps, args.latency, args.throttle_rate,
+                           args.malformed_rate, args.invalid_rate)
+    print(f"Steam stand-in listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    server.serve_forever()
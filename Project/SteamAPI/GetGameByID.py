@@ -1,30 +1,23 @@
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import time
 import json
 
-def create_session_with_retries():
-    session = requests.Session()
-    retry = Retry(
-        total=10,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"]
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+import http_client
+from response_cache import RESPONSE_CACHE
 
 def get_game_details_from_steam(appid, api_key, country='US'):
-    url = f"http://store.steampowered.com/api/appdetails?appids={appid}&cc={country}&key={api_key}"
-    session = create_session_with_retries()
+    data = RESPONSE_CACHE.get("appdetails", appid, country)
+    if data is not None:
+        if str(appid) in data and data[str(appid)].get('success'):
+            return data[str(appid)]['data']
+        return None
+    url = f"https://store.steampowered.com/api/appdetails?appids={appid}&cc={country}&key={api_key}"
     while True:
         try:
-            response = session.get(url)
+            response = http_client.get(url)
             response.raise_for_status()
             data = response.json()
+            RESPONSE_CACHE.set("appdetails", appid, data, country)
             if str(appid) in data and data[str(appid)].get('success'):
                 return data[str(appid)]['data']
             else:
@@ -45,9 +38,13 @@ def save_to_json(data, filename='game_info.json'):
         json.dump(data, f, ensure_ascii=False, indent=4)
 
 def get_game_data_from_steamspy(appid):
+    cached = RESPONSE_CACHE.get("steamspy_appdetails", appid)
+    if cached is not None:
+        return cached
     url = f"https://steamspy.com/api.php?request=appdetails&appid={appid}"
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
+    RESPONSE_CACHE.set("steamspy_appdetails", appid, data)
     return data
 def get_game_info(appid, api_key):
     steam_details = get_game_details_from_steam(appid, api_key)
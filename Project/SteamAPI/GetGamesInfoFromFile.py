@@ -1,5 +1,9 @@
 import json
 
+import numpy as np
+
+from catalog_columns import CatalogColumns
+
 
 def analyze_games(file_path, specific_tag):
     try:
@@ -7,20 +11,13 @@ def analyze_games(file_path, specific_tag):
             games = json.load(file)
 
         total_games = len(games)
-        games_with_reviews = []
-        no_reviews_and_online = 0
-        games_with_specific_tag = 0
-
-        for game in games:
-            total_reviews = game.get("PositiveReviews", 0) + game.get("NegativeReviews", 0)
-            if total_reviews > 1000:
-                games_with_reviews.append(game["Name"])
-
-            if total_reviews == 0 and game.get("DayPeak", 0) == 0:
-                no_reviews_and_online += 1
+        columns = CatalogColumns(games)
+        games_with_reviews = [games[position]["Name"] for position in np.flatnonzero(columns.total > 1000).tolist()]
+        no_reviews_and_online = int(np.count_nonzero((columns.total == 0) & (columns.day_peak == 0)))
 
-            if any(specific_tag.lower() in tag.lower() for tag in game.get("TopTags", [])):
-                games_with_specific_tag += 1
+        tag_query = specific_tag.lower()
+        games_with_specific_tag = sum(
+            1 for game in games if any(tag_query in tag.lower() for tag in game.get("TopTags", [])))
 
         return {
             "Total games": total_games,
@@ -1,8 +1,8 @@
+import argparse
+import asyncio
 import html
-import os
 import time
-from pathlib import Path
-from TelegramBot import config
+from urllib.parse import urlsplit
 
 import requests
 import json
@@ -10,25 +10,65 @@ from tqdm import tqdm
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import http_client
+from catalog_merge import CatalogMerger
+from progress_journal import ProgressJournal
+from rate_limiter import AIMDController, TokenBucket, parse_retry_after
+from response_cache import RESPONSE_CACHE
+from segment_store import SegmentStore
+from telemetry import Telemetry
 
+# Default request rates (requests per second) for the async crawl mode
+STEAM_REQUESTS_PER_SECOND = 200 / 300
+STEAMSPY_REQUESTS_PER_SECOND = 1.0
 
-# Save invalid game data to JSON file
+# Upper bounds of the adaptive in-flight request windows
+STEAM_CONCURRENCY = 8
+STEAMSPY_CONCURRENCY = 4
+
+# Number of times a 5xx response is retried before it is raised
+MAX_SERVER_ERROR_RETRIES = 5
+
+# Base URLs of the APIs used by the crawler, the benchmark points them at a local stand-in
+STEAM_STORE_URL = "https://store.steampowered.com"
+STEAM_API_URL = "https://api.steampowered.com"
+STEAMSPY_URL = "https://steamspy.com"
+
+# Append-only stores for the games processed during the current crawl
+DETAILED_STORE = SegmentStore("segments/detailed_steam_games")
+INVALID_STORE = SegmentStore("segments/invalid_games")
+
+# Incremental merge of crawled batches into the catalog files
+CATALOG_MERGER = CatalogMerger()
+
+# Outcome of every app ID of the current crawl, used by --resume
+JOURNAL = ProgressJournal()
+
+# Adaptive limits on the requests in flight to each API host
+STEAM_CONTROLLER = AIMDController(initial=2, maximum=STEAM_CONCURRENCY)
+STEAMSPY_CONTROLLER = AIMDController(initial=1, maximum=STEAMSPY_CONCURRENCY)
+
+# Stage timings and counters of the crawl, written to SteamAPI/JSON/crawl_metrics.json while it runs
+TELEMETRY = Telemetry()
+TELEMETRY.add_gauge("steam_controller", STEAM_CONTROLLER.report)
+TELEMETRY.add_gauge("steamspy_controller", STEAMSPY_CONTROLLER.report)
+TELEMETRY.add_gauge("response_cache", RESPONSE_CACHE.stats)
+
+
+# Save invalid game data to the invalid games store
 def save_invalid_game(appid):
-    json_file_path = "invalid_games.json"
     game_info = {
         "ID": appid,
         "Name": "Invalid Game"
     }
-    if Path(json_file_path).exists():
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    else:
-        data = []
-    data.append(game_info)
-    with open(json_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+    with TELEMETRY.stage("persist"):
+        INVALID_STORE.append(game_info)
+
+
+# Record the outcome of a game in the crawl journal and the telemetry counters
+def record_outcome(appid, status, reason=""):
+    JOURNAL.record(appid, status, reason)
+    TELEMETRY.increment(f"games_{status}")
 
 
 # Check if the game data is complete
@@ -40,35 +80,14 @@ def is_data_complete(details):
     return has_developers and has_publishers
 
 
-# Create a session with retry logic for requests
+# Shared pooled session of the Steam store, 429 and 5xx responses are left to the adaptive concurrency controllers
 def create_session_with_retries():
-    session = requests.Session()
-    retry = Retry(
-        total=10,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"]
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
-
-
-# Load existing game IDs from JSON files
-def load_existing_game_ids():
-    def load_ids_from_file(json_file_path):
-        try:
-            with open(json_file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                return {game["ID"] for game in data}
-        except (FileNotFoundError, json.JSONDecodeError):
-            return set()
+    return http_client.get_session(urlsplit(STEAM_STORE_URL).netloc)
 
-    valid_ids = load_ids_from_file("SteamAPI/JSON/detailed_games_actual.json")
-    invalid_ids = load_ids_from_file("SteamAPI/JSON/invalid_games_actual.json")
-    combined_ids = valid_ids.union(invalid_ids)
-    return combined_ids
+
+# Load existing game IDs from the persistent catalog index
+def load_existing_game_ids():
+    return CATALOG_MERGER.known_ids()
 
 
 # Parse supported languages from HTML
@@ -85,47 +104,86 @@ def parse_supported_languages(languages_html):
     }
 
 
-# Fetch game data from SteamSpy
+# Send a GET request within the in-flight window of its host, retrying 429 and 5xx responses
+def get_with_backoff(controller, url, session=None, metric="http"):
+    server_errors = 0
+    while True:
+        with controller.slot():
+            started = time.monotonic()
+            try:
+                if session is not None:
+                    response = session.get(url, timeout=http_client.DEFAULT_TIMEOUT)
+                else:
+                    response = http_client.get(url)
+            except requests.exceptions.RequestException:
+                TELEMETRY.increment(f"{metric}_connection_errors")
+                controller.on_error()
+                raise
+            latency = time.monotonic() - started
+        TELEMETRY.observe(metric, latency)
+        if response.status_code == 429:
+            TELEMETRY.increment(f"{metric}_429")
+            TELEMETRY.increment(f"{metric}_retries")
+            controller.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+            continue
+        if response.status_code >= 500:
+            TELEMETRY.increment(f"{metric}_5xx")
+            controller.on_error()
+            server_errors += 1
+            if server_errors <= MAX_SERVER_ERROR_RETRIES:
+                TELEMETRY.increment(f"{metric}_retries")
+                time.sleep(parse_retry_after(response.headers.get("Retry-After")) or server_errors)
+                continue
+            return response
+        controller.on_success(latency)
+        return response
+
+
+# Fetch game data from SteamSpy, served from the response cache when fresh
 def get_game_data_from_steamspy(appid):
-    url = f"https://steamspy.com/api.php?request=appdetails&appid={appid}"
-    response = requests.get(url)
+    cached = RESPONSE_CACHE.get("steamspy_appdetails", appid)
+    if cached is not None:
+        return cached
+    url = f"{STEAMSPY_URL}/api.php?request=appdetails&appid={appid}"
+    response = get_with_backoff(STEAMSPY_CONTROLLER, url, metric="steamspy_fetch")
+    response.raise_for_status()
     data = response.json()
+    RESPONSE_CACHE.set("steamspy_appdetails", appid, data)
     return data
 
 
 # Fetch all games from Steam API
 def get_all_games():
-    response = requests.get("http://api.steampowered.com/ISteamApps/GetAppList/v2")
+    response = http_client.get(f"{STEAM_API_URL}/ISteamApps/GetAppList/v2")
     games = response.json()['applist']['apps']
     return games
 
 
-# Fetch game details from Steam API with retry logic
+# Fetch game details from Steam API with retry logic, served from the response cache when fresh
 def fetch_game_details_from_steam(appid, session, api_key, country='US'):
-    url = f"http://store.steampowered.com/api/appdetails?appids={appid}&cc={country}&key={api_key}"
-    while True:
-        try:
-            response = session.get(url)
-            response.raise_for_status()
-            if not response.content:
-                print(f"Empty response for appid {appid}")
-                return None
-            cleaned_content = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', response.text)
-            return json.loads(cleaned_content)
-        except requests.exceptions.HTTPError as err:
-            if response.status_code == 429:
-                time.sleep(5)
-                continue
-            else:
-                raise err
-        except ValueError as e:
-            print(e)
-            return None
+    cached = RESPONSE_CACHE.get("appdetails", appid, country)
+    if cached is not None:
+        return cached
+    url = f"{STEAM_STORE_URL}/api/appdetails?appids={appid}&cc={country}&key={api_key}"
+    response = get_with_backoff(STEAM_CONTROLLER, url, session, metric="steam_fetch")
+    response.raise_for_status()
+    if not response.content:
+        print(f"Empty response for appid {appid}")
+        return None
+    try:
+        cleaned_content = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', response.text)
+        data = json.loads(cleaned_content)
+    except ValueError as e:
+        print(e)
+        return None
+    RESPONSE_CACHE.set("appdetails", appid, data, country)
+    return data
 
 
-# Get top tags for a game from SteamSpy
-def get_top_tags_for_game(appid):
-    data = get_game_data_from_steamspy(appid)
+# Get top tags for a game from SteamSpy, reusing already fetched SteamSpy data if given
+def get_top_tags_for_game(appid, data=None):
+    if data is None:
+        data = get_game_data_from_steamspy(appid)
     tags = data.get('tags', {})
     if isinstance(tags, dict):
         sorted_tags = sorted(tags.items(), key=lambda item: item[1], reverse=True)
@@ -134,238 +192,283 @@ def get_top_tags_for_game(appid):
     return ["No tags found"]
 
 
-# Save game details to JSON file
-def save_games_details(game_info, file_path):
-    json_file_path = file_path
-    if file_path == "invalid_games.json":
-        game_info = {
-            "ID": game_info["ID"],
-            "Name": game_info["Name"]
-        }
-    if Path(json_file_path).exists() and os.path.getsize(json_file_path) > 0:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-    else:
-        data = []
-
+# Unescape the HTML entities of the text fields of a game record
+def unescape_fields(game_info):
     for key, value in game_info.items():
         if isinstance(value, str):
             game_info[key] = html.unescape(value)
-
-    data.append(game_info)
-    with open(json_file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-
-# Load data from a JSON file
-def load_json_file(file_path):
-    try:
-        if os.path.getsize(file_path) == 0:
-            return []
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return None
-    except json.JSONDecodeError:
-        return None
+    return game_info
 
 
-# Save data to a JSON file
-def save_json_file(data, file_path):
-    try:
-        with open(file_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=4, ensure_ascii=False)
-    except IOError:
-        print(f"Error: Could not write to file - {file_path}")
-
-
-# Merge two JSON files and save the combined data
-def merge_json_files(file_path1, file_path2, output_file_path):
-    data1 = load_json_file(file_path1)
-    data2 = load_json_file(file_path2)
-
-    if data1 is None or data2 is None:
-        return
-
-    combined_data = data1 + data2
-    save_json_file(combined_data, output_file_path)
-    try:
-        os.remove(file_path2)
-        print(f"File {file_path2} has been removed.")
-    except OSError as e:
-        print(f"Error: {file_path2} : {e.strerror}")
-
-
-# Check for duplicates and incomplete entries in the data
-def check_for_duplicates_and_completeness(data, file_name):
-    seen_ids = set()
-    duplicates = set()
-    incomplete_entries = []
-
-    essential_fields = [
-        "ID", "Name", "ImageURL", "Price", "Developer", "Publisher", "PositiveReviews",
-        "NegativeReviews", "DayPeak", "TopTags", "LanguagesSub", "LanguagesAudio",
-        "ShortDesc", "ReleaseDate", "Platforms"
-    ]
-
-    if file_name == 'invalid_games_actual.json':
-        essential_fields = [
-            "ID", "Name"
-        ]
-
-    for entry in data:
-        game_id = entry.get("ID")
-        if game_id in seen_ids:
-            duplicates.add(game_id)
-        seen_ids.add(game_id)
-
-        if any(entry.get(field) is None for field in essential_fields):
-            incomplete_entries.append(game_id)
-
-    return duplicates, incomplete_entries
+# Save game details to a segment store
+def save_games_details(game_info, store):
+    if store is INVALID_STORE:
+        game_info = {
+            "ID": game_info["ID"],
+            "Name": game_info["Name"]
+        }
 
+    unescape_fields(game_info)
+    with TELEMETRY.stage("persist"):
+        store.append(game_info)
 
-# Remove duplicate entries from the data
-def remove_duplicates(data):
-    unique_data = {}
-    for item in data:
-        item_id = item.get("ID")
-        if item_id not in unique_data:
-            unique_data[item_id] = item
-    return list(unique_data.values())
 
+# Extract game details from a Steam response, returns None for invalid games
+def get_valid_steam_details(appid, steam_data):
+    if not steam_data or not steam_data.get(str(appid), {}).get('success'):
+        return None
 
-# Transform JSON data structure
-def transform_json(input_file_path, output_file_path):
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+    steam_details = steam_data[str(appid)]['data']
+    if 'trailer' in steam_details.get('name', '').lower() and not steam_details.get('short_description'):
+        return None
+    return steam_details
+
+
+# Build the game record from Steam and SteamSpy data
+def build_game_info(appid, steam_details, steamspy_data):
+    top_tags = get_top_tags_for_game(appid, steamspy_data)
+    price = "N/A"
+    if steam_details.get('is_free', False):
+        price = "Free"
+    elif 'price_overview' in steam_details:
+        price = steam_details['price_overview'].get('final_formatted', 'Price not available')
+    elif 'release_date' in steam_details and steam_details['release_date'].get('coming_soon'):
+        price = "Coming Soon"
+    elif 'packages' in steam_details:
+        for package in steam_details['packages']:
+            if isinstance(package, dict) and 'price' in package:
+                price = package['price']
+                break
+    return {
+        "ID": appid,
+        "Name": steam_details.get('name', 'Unknown'),
+        "ImageURL": steam_details.get('header_image', 'No image available'),
+        "Price": price,
+        "Developer": steam_details.get('developers', ['Unknown'])[0],
+        "Publisher": steam_details.get('publishers', ['Unknown'])[0],
+        "PositiveReviews": steamspy_data.get("positive", 0),
+        "NegativeReviews": steamspy_data.get("negative", 0),
+        "DayPeak": steamspy_data.get("ccu", 0),
+        "TopTags": top_tags,
+        "LanguagesSub": parse_supported_languages(steam_details.get('supported_languages', 'Not available'))[
+            "Subtitles"],
+        "LanguagesAudio": parse_supported_languages(steam_details.get('supported_languages', 'Not available'))[
+            "Full Audio"],
+        "ShortDesc": steam_details.get('short_description', 'No description available'),
+        "ReleaseDate": steam_details.get('release_date', {}).get('date', 'Unknown'),
+        "Platforms": ', '.join(
+            platform for platform, available in steam_details.get('platforms', {}).items() if available),
+    }
 
-        transformed_data = {item['ID']: item for item in data}
 
-        with open(output_file_path, 'w', encoding='utf-8') as file:
-            json.dump(transformed_data, file, indent=4, ensure_ascii=False)
-    except FileNotFoundError:
-        print(f"Error: File not found - {input_file_path}")
-    except json.JSONDecodeError:
-        print("Error: File is not a valid JSON - unable to read.")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+# Build the game record from Steam and SteamSpy data and save it to the matching store
+def save_game(appid, steam_details, steamspy_data):
+    with TELEMETRY.stage("parse"):
+        game_info = build_game_info(appid, steam_details, steamspy_data)
+    if is_data_complete(steam_details):
+        save_games_details(game_info, DETAILED_STORE)
+        record_outcome(appid, "valid")
+    else:
+        save_games_details(game_info, INVALID_STORE)
+        record_outcome(appid, "invalid", "incomplete data")
 
 
 # Process a single game by fetching and saving its details
 def process_game(appid, session, api_key):
     try:
         steam_data = fetch_game_details_from_steam(appid, session, api_key)
-        if not steam_data or not steam_data.get(str(appid), {}).get('success'):
-            save_invalid_game(appid)
-            return None
-
-        steam_details = steam_data[str(appid)]['data']
-        if 'trailer' in steam_details.get('name', '').lower() and not steam_details.get('short_description'):
+        steam_details = get_valid_steam_details(appid, steam_data)
+        if steam_details is None:
             save_invalid_game(appid)
+            record_outcome(appid, "invalid", "no store data")
             return None
 
         steamspy_data = get_game_data_from_steamspy(appid)
-        top_tags = get_top_tags_for_game(appid)
-        price = "N/A"
-        if steam_details.get('is_free', False):
-            price = "Free"
-        elif 'price_overview' in steam_details:
-            price = steam_details['price_overview'].get('final_formatted', 'Price not available')
-        elif 'release_date' in steam_details and steam_details['release_date'].get('coming_soon'):
-            price = "Coming Soon"
-        elif 'packages' in steam_details:
-            for package in steam_details['packages']:
-                if isinstance(package, dict) and 'price' in package:
-                    price = package['price']
-                    break
-        game_info = {
-            "ID": appid,
-            "Name": steam_details.get('name', 'Unknown'),
-            "ImageURL": steam_details.get('header_image', 'No image available'),
-            "Price": price,
-            "Developer": steam_details.get('developers', ['Unknown'])[0],
-            "Publisher": steam_details.get('publishers', ['Unknown'])[0],
-            "PositiveReviews": steamspy_data.get("positive", 0),
-            "NegativeReviews": steamspy_data.get("negative", 0),
-            "DayPeak": steamspy_data.get("ccu", 0),
-            "TopTags": top_tags,
-            "LanguagesSub": parse_supported_languages(steam_details.get('supported_languages', 'Not available'))[
-                "Subtitles"],
-            "LanguagesAudio": parse_supported_languages(steam_details.get('supported_languages', 'Not available'))[
-                "Full Audio"],
-            "ShortDesc": steam_details.get('short_description', 'No description available'),
-            "ReleaseDate": steam_details.get('release_date', {}).get('date', 'Unknown'),
-            "Platforms": ', '.join(
-                platform for platform, available in steam_details.get('platforms', {}).items() if available),
-        }
-        if is_data_complete(steam_details):
-            save_games_details(game_info, "detailed_steam_games.json")
-        else:
-            save_games_details(game_info, "invalid_games.json")
+        save_game(appid, steam_details, steamspy_data)
         return appid
     except Exception as e:
         print(f"Failed to process game ID {appid}: {e}")
         save_invalid_game(appid)
+        record_outcome(appid, "failed", e)
         return None
 
 
+# Fetch a single game and return its record without writing it to the crawl stores or the journal,
+# None when Steam has no complete store data for it. Used by the bot, which may run next to a crawl
+def fetch_game(appid, session, api_key):
+    steam_data = fetch_game_details_from_steam(appid, session, api_key)
+    steam_details = get_valid_steam_details(appid, steam_data)
+    if steam_details is None or not is_data_complete(steam_details):
+        return None
+    steamspy_data = get_game_data_from_steamspy(appid)
+    return unescape_fields(build_game_info(appid, steam_details, steamspy_data))
+
+
+# Hand the games processed so far over to the incremental catalog merge
+def merge_batch():
+    valid_segments = DETAILED_STORE.drain()
+    invalid_segments = INVALID_STORE.drain()
+    with TELEMETRY.stage("merge_batch"):
+        updated = CATALOG_MERGER.apply_batch(valid_segments, invalid_segments)
+    if updated:
+        print(f"{updated} already known game(s) will be updated.")
+
+
+# Crawl games through one shared asyncio pipeline: Steam fetches feed SteamSpy fetches,
+# each stage with its own in-flight limit and token bucket, and merges run in the background
+async def crawl_games_async(appids, session, api_key, steam_concurrency=STEAM_CONCURRENCY,
+                            steamspy_concurrency=STEAMSPY_CONCURRENCY, steam_rate=STEAM_REQUESTS_PER_SECOND,
+                            steamspy_rate=STEAMSPY_REQUESTS_PER_SECOND, merge_every=100):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=steam_concurrency + steamspy_concurrency)
+    steam_bucket = TokenBucket(steam_rate)
+    steamspy_bucket = TokenBucket(steamspy_rate)
+    pending = asyncio.Queue()
+    for appid in appids:
+        pending.put_nowait(appid)
+    steamspy_queue = asyncio.Queue(maxsize=steamspy_concurrency * 4)
+    progress = tqdm(total=len(appids), desc="Processing new games")
+    completed = 0
+    merge_future = None
+
+    # Count a finished game and start a background merge every merge_every games
+    def finish():
+        nonlocal completed, merge_future
+        completed += 1
+        progress.set_postfix(steam_window=STEAM_CONTROLLER.window, steamspy_window=STEAMSPY_CONTROLLER.window,
+                             refresh=False)
+        progress.update(1)
+        if completed % merge_every == 0 and (merge_future is None or merge_future.done()):
+            merge_future = loop.run_in_executor(None, merge_batch)
+
+    async def steam_worker():
+        while not pending.empty():
+            appid = pending.get_nowait()
+            await steam_bucket.acquire()
+            try:
+                steam_data = await loop.run_in_executor(executor, fetch_game_details_from_steam, appid, session,
+                                                        api_key)
+                steam_details = get_valid_steam_details(appid, steam_data)
+            except Exception as e:
+                print(f"Failed to process game ID {appid}: {e}")
+                save_invalid_game(appid)
+                record_outcome(appid, "failed", e)
+                finish()
+                continue
+            if steam_details is None:
+                save_invalid_game(appid)
+                record_outcome(appid, "invalid", "no store data")
+                finish()
+                continue
+            await steamspy_queue.put((appid, steam_details))
+
+    async def steamspy_worker():
+        while True:
+            item = await steamspy_queue.get()
+            if item is None:
+                return
+            appid, steam_details = item
+            await steamspy_bucket.acquire()
+            try:
+                steamspy_data = await loop.run_in_executor(executor, get_game_data_from_steamspy, appid)
+                save_game(appid, steam_details, steamspy_data)
+            except Exception as e:
+                print(f"Failed to process game ID {appid}: {e}")
+                save_invalid_game(appid)
+                record_outcome(appid, "failed", e)
+            finish()
+
+    steamspy_workers = [asyncio.create_task(steamspy_worker()) for _ in range(steamspy_concurrency)]
+    await asyncio.gather(*(steam_worker() for _ in range(steam_concurrency)))
+    for _ in steamspy_workers:
+        await steamspy_queue.put(None)
+    await asyncio.gather(*steamspy_workers)
+    progress.close()
+    executor.shutdown()
+
+    if merge_future is not None:
+        await merge_future
+    merge_batch()
+
+
 # Main function to process new games and update JSON files
-def main(api_key):
-    # Remove old JSON files if they exist
-    if os.path.exists("detailed_steam_games.json"):
-        os.remove("detailed_steam_games.json")
-    if os.path.exists("invalid_games.json"):
-        os.remove("invalid_games.json")
-
-    # Load existing game IDs to avoid reprocessing
-    existing_ids = load_existing_game_ids()
-    all_games = get_all_games()
-    steam_game_ids = set(int(game['appid']) for game in all_games)
-    new_games = list(steam_game_ids - existing_ids)
+def main(api_key, use_async=False, steam_concurrency=STEAM_CONCURRENCY, steamspy_concurrency=STEAMSPY_CONCURRENCY,
+         steam_rate=STEAM_REQUESTS_PER_SECOND, steamspy_rate=STEAMSPY_REQUESTS_PER_SECOND, resume=False):
+    if resume and JOURNAL.exists():
+        # Continue an interrupted crawl, its segments are merged together with the remaining games
+        new_games = JOURNAL.resume()
+    else:
+        if resume:
+            print("No crawl journal found, starting a new crawl.")
+        # Remove segments left over from a previous run
+        DETAILED_STORE.clear()
+        INVALID_STORE.clear()
+
+        # Load existing game IDs to avoid reprocessing
+        existing_ids = load_existing_game_ids()
+        all_games = get_all_games()
+        steam_game_ids = set(int(game['appid']) for game in all_games)
+        new_games = list(steam_game_ids - existing_ids)
+        JOURNAL.start(new_games)
 
     new_games_count = len(new_games)
     print("Count of new games:", new_games_count)
+    TELEMETRY.start()
 
+    STEAM_CONTROLLER.maximum = steam_concurrency
+    STEAMSPY_CONTROLLER.maximum = steamspy_concurrency
+    http_client.configure_pool(urlsplit(STEAM_STORE_URL).netloc, steam_concurrency)
+    http_client.configure_pool(urlsplit(STEAMSPY_URL).netloc, steamspy_concurrency)
     session = create_session_with_retries()
 
-    batch_size = 100
-    for i in range(0, len(new_games), batch_size):
-        current_batch = new_games[i:i + batch_size]
-        print(f"Processing batch from game {i + 1} to {i + len(current_batch)}...")
-
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            futures = [executor.submit(process_game, appid, session, api_key) for appid in current_batch]
-            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing new games"):
-                future.result()
-
-        # Merge and clean up JSON files after each batch
-        merge_json_files("SteamAPI/JSON/detailed_games_actual.json", "detailed_steam_games.json",
-                         "SteamAPI/JSON/detailed_games_actual.json")
-        merge_json_files("SteamAPI/JSON/invalid_games_actual.json", "invalid_games.json", "SteamAPI/JSON/invalid_games_actual.json")
-        data1 = load_json_file("SteamAPI/JSON/detailed_games_actual.json")
-        duplicates1, incomplete_entries1 = check_for_duplicates_and_completeness(data1,
-                                                                                 "SteamAPI/JSON/detailed_games_actual.json")
-        data2 = load_json_file("SteamAPI/JSON/invalid_games_actual.json")
-        duplicates2, incomplete_entries2 = check_for_duplicates_and_completeness(data2,
-                                                                                 "SteamAPI/JSON/invalid_games_actual.json")
-
-        if duplicates1:
-            cleaned_data = remove_duplicates(data1)
-            save_json_file(cleaned_data, "SteamAPI/JSON/detailed_games_actual.json")
-        if duplicates2:
-            cleaned_data = remove_duplicates(data2)
-            save_json_file(cleaned_data, "SteamAPI/JSON/invalid_games_actual.json")
-
-        transform_json("SteamAPI/JSON/detailed_games_actual.json", "SteamAPI/JSON/detailed_games_transformed.json")
-
-        print(f"Batch processing complete for games {i + 1} to {i + len(current_batch)}.")
-
+    if use_async:
+        asyncio.run(crawl_games_async(new_games, session, api_key, steam_concurrency, steamspy_concurrency,
+                                      steam_rate, steamspy_rate))
+    else:
+        batch_size = 100
+        for i in range(0, len(new_games), batch_size):
+            current_batch = new_games[i:i + batch_size]
+            print(f"Processing batch from game {i + 1} to {i + len(current_batch)}...")
+
+            with ThreadPoolExecutor(max_workers=steam_concurrency) as executor:
+                futures = [executor.submit(process_game, appid, session, api_key) for appid in current_batch]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing new games"):
+                    future.result()
+
+            # Hand the batch over to the catalog merge, the JSON files are written once at the end
+            merge_batch()
+
+            print(f"Batch processing complete for games {i + 1} to {i + len(current_batch)}.")
+            print(f"Steam: {STEAM_CONTROLLER.report()}, SteamSpy: {STEAMSPY_CONTROLLER.report()}")
+
+    merge_batch()
+    with TELEMETRY.stage("catalog_write"):
+        CATALOG_MERGER.finalize()
+    JOURNAL.close(completed=True)
+    TELEMETRY.stop()
     print("All new games processed.")
+    print("Response cache:", RESPONSE_CACHE.stats())
+    print(f"Metrics written to {TELEMETRY.path}.")
 
 
 # Entry point for the script
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch new Steam games and update the JSON catalog.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="crawl with the asyncio pipeline instead of thread batches")
+    parser.add_argument("--steam-concurrency", type=int, default=STEAM_CONCURRENCY,
+                        help="maximum number of Steam store requests in flight")
+    parser.add_argument("--steamspy-concurrency", type=int, default=STEAMSPY_CONCURRENCY,
+                        help="maximum number of SteamSpy requests in flight")
+    parser.add_argument("--steam-rate", type=float, default=STEAM_REQUESTS_PER_SECOND,
+                        help="Steam store requests per second")
+    parser.add_argument("--steamspy-rate", type=float, default=STEAMSPY_REQUESTS_PER_SECOND,
+                        help="SteamSpy requests per second")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the interrupted crawl recorded in the progress journal")
+    args = parser.parse_args()
+
+    from TelegramBot import config
     api_key = config.SteamKey
-    main(api_key)
+    main(api_key, args.use_async, args.steam_concurrency, args.steamspy_concurrency, args.steam_rate,
+         args.steamspy_rate, args.resume)
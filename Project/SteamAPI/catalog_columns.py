@@ -0,0 +1,92 @@
+import datetime
+from functools import lru_cache
+
+import numpy as np
+
+# Columns kept for every game
+COLUMNS = ("id", "positive", "negative", "day_peak", "release", "total", "ratio")
+
+# Release date formats found in the catalog, full dates and bare years
+RELEASE_DATE_FORMATS = ("%b %d, %Y", "%Y")
+
+
+# Day ordinal of a release date, 0 when it is missing or cannot be parsed, many games share a date
+@lru_cache(maxsize=None)
+def release_ordinal(date_str):
+    for date_format in RELEASE_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date_str, date_format).toordinal()
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+# Numeric fields of a list of games as NumPy columns, position i of every column belongs to games[i]
+class CatalogColumns:
+    def __init__(self, games):
+        count = len(games)
+        self.id = np.fromiter((to_int(game.get("ID")) for game in games), dtype=np.int64, count=count)
+        self.positive = np.fromiter((game.get("PositiveReviews", 0) for game in games), dtype=np.int64, count=count)
+        self.negative = np.fromiter((game.get("NegativeReviews", 0) for game in games), dtype=np.int64, count=count)
+        self.day_peak = np.fromiter((game.get("DayPeak", 0) or 0 for game in games), dtype=np.int64, count=count)
+        self.release = np.fromiter((release_ordinal(game.get("ReleaseDate")) for game in games), dtype=np.int32,
+                                   count=count)
+        self.total = self.positive + self.negative
+        self.ratio = np.divide(self.positive, self.total, out=np.zeros(count), where=self.total > 0)
+
+    def __len__(self):
+        return len(self.id)
+
+    # Arrays written to the catalog snapshot
+    def to_snapshot(self):
+        return {column: getattr(self, column) for column in COLUMNS}
+
+    @classmethod
+    def from_snapshot(cls, parts):
+        columns = cls.__new__(cls)
+        for column in COLUMNS:
+            setattr(columns, column, parts[column])
+        return columns
+
+    # Copy of the columns with the games at the given positions replaced, positions past the end are appended
+    def with_games(self, positions, games):
+        values = CatalogColumns(games)
+        positions = np.asarray(positions, dtype=np.int64)
+        count = max(len(self), int(positions.max()) + 1) if len(positions) else len(self)
+        columns = CatalogColumns.__new__(CatalogColumns)
+        for column in COLUMNS:
+            array = getattr(self, column)
+            updated = np.zeros(count, dtype=array.dtype)
+            updated[:len(array)] = array
+            updated[positions] = getattr(values, column)
+            setattr(columns, column, updated)
+        return columns
+
+    # Positions sorted by a column, descending by default, equal values keep their catalog order
+    def sort(self, column, positions=None, descending=True):
+        values = getattr(self, column)
+        if positions is None:
+            positions = np.arange(len(values))
+        keys = values[positions]
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        return positions[order]
+
+    # The k best positions by a column among those selected by the mask, in the same order sort would give
+    def top_k(self, column, k, mask=None, descending=True):
+        values = getattr(self, column)
+        positions = np.flatnonzero(mask) if mask is not None else np.arange(len(values))
+        if len(positions) <= k:
+            return self.sort(column, positions, descending)
+        keys = -values[positions] if descending else values[positions]
+        # Everything better than the k-th key, then the first positions equal to it
+        kth = np.partition(keys, k - 1)[k - 1]
+        better = positions[keys < kth]
+        equal = positions[keys == kth][:k - len(better)]
+        return self.sort(column, np.concatenate((better, equal)), descending)
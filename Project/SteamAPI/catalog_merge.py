@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from catalog_snapshot import SNAPSHOT_PATH, write_snapshot
+from game_catalog import GameCatalog
+from segment_store import SegmentStore, read_footer, read_segment
+
+# Catalog files produced by the crawler
+VALID_GAMES_PATH = "SteamAPI/JSON/detailed_games_actual.json"
+INVALID_GAMES_PATH = "SteamAPI/JSON/invalid_games_actual.json"
+TRANSFORMED_GAMES_PATH = "SteamAPI/JSON/detailed_games_transformed.json"
+
+# Persistent index of every known game ID and the file it belongs to
+INDEX_PATH = "SteamAPI/JSON/catalog_index.tsv"
+
+# Segments merged during the current run but not yet written to the catalog files
+DELTA_DIRECTORY = "SteamAPI/JSON/delta"
+
+# Games upserted by the bot since the catalog files were last written
+PATCH_DIRECTORY = "SteamAPI/JSON/catalog_patches"
+
+# Locked around every rewrite of the catalog files, the crawler and the bot both rewrite them
+LOCK_PATH = "SteamAPI/JSON/catalog.lock"
+
+
+# Use integer IDs wherever the ID is numeric, the catalog files mix both forms
+def normalize_id(game_id):
+    try:
+        return int(game_id)
+    except (TypeError, ValueError):
+        return game_id
+
+
+# Load a JSON list of games, returns an empty list if the file is missing and None if it is broken
+def load_games(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON data from {file_path}: {e}")
+        return None
+
+
+# Hold an exclusive lock on the catalog files across processes, on platforms without flock only the
+# in-process lock of CatalogMerger applies
+@contextmanager
+def catalog_file_lock(lock_path=LOCK_PATH):
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(lock_path, 'a') as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        # Closing the file releases the lock
+        yield
+
+
+# Write JSON to a temporary file and move it into place
+def write_json_atomic(data, file_path):
+    temp_path = file_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+    os.replace(temp_path, file_path)
+
+
+# Applies crawled batches to the catalog in O(batch) and writes the catalog files once per run
+class CatalogMerger:
+    def __init__(self, valid_path=VALID_GAMES_PATH, invalid_path=INVALID_GAMES_PATH,
+                 transformed_path=TRANSFORMED_GAMES_PATH, index_path=INDEX_PATH, delta_directory=DELTA_DIRECTORY,
+                 snapshot_path=SNAPSHOT_PATH, patch_directory=PATCH_DIRECTORY, lock_path=LOCK_PATH):
+        self.valid_path = valid_path
+        self.invalid_path = invalid_path
+        self.transformed_path = transformed_path
+        self.snapshot_path = snapshot_path
+        self.index_path = index_path
+        self.valid_delta = SegmentStore(os.path.join(delta_directory, "valid"))
+        self.invalid_delta = SegmentStore(os.path.join(delta_directory, "invalid"))
+        self.patches = SegmentStore(patch_directory, max_records=1)
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._ids = None
+
+    # Modification times of the catalog files the index was built from
+    def _source_stamp(self):
+        stamp = []
+        for file_path in (self.valid_path, self.invalid_path):
+            stamp.append(str(os.stat(file_path).st_mtime_ns) if os.path.exists(file_path) else "0")
+        return " ".join(stamp)
+
+    # Read the index file, returns None if it is missing or the catalog files changed since
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                header = file.readline().rstrip("\n")
+                if header != f"#source {self._source_stamp()}":
+                    return None
+                ids = {}
+                for line in file:
+                    game_id, _, kind = line.rstrip("\n").partition("\t")
+                    if kind:
+                        ids[normalize_id(game_id)] = kind
+                return ids
+        except FileNotFoundError:
+            return None
+
+    # Rewrite the index file from the in-memory index
+    def _write_index(self):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(f"#source {self._source_stamp()}\n")
+            file.writelines(f"{game_id}\t{kind}\n" for game_id, kind in self._ids.items())
+        os.replace(temp_path, self.index_path)
+
+    # Load the ID index, building it once from the catalog files and pending segments if needed
+    def load_index(self):
+        with self._lock:
+            if self._ids is None:
+                ids = self._read_index()
+                if ids is None:
+                    print("Building catalog ID index...")
+                    ids = {}
+                    for kind, file_path, delta in (("valid", self.valid_path, self.valid_delta),
+                                                   ("invalid", self.invalid_path, self.invalid_delta)):
+                        for game in load_games(file_path) or []:
+                            ids[normalize_id(game.get("ID"))] = kind
+                        for game in delta.iter_records():
+                            ids[normalize_id(game.get("ID"))] = kind
+                    self._ids = ids
+                    self._write_index()
+                else:
+                    self._ids = ids
+            return self._ids
+
+    # All game IDs that are already in the catalog or pending in this run
+    def known_ids(self):
+        return set(self.load_index())
+
+    # Take over the sealed segments of a batch and record their IDs, returns the number of updated games
+    def apply_batch(self, valid_segments, invalid_segments):
+        ids = self.load_index()
+        updated = 0
+        with self._lock:
+            lines = []
+            for kind, segments, delta in (("valid", valid_segments, self.valid_delta),
+                                          ("invalid", invalid_segments, self.invalid_delta)):
+                for segment_path in segments:
+                    for record in read_segment(segment_path):
+                        if "ID" not in record:
+                            continue
+                        game_id = normalize_id(record["ID"])
+                        if game_id in ids:
+                            updated += 1
+                        ids[game_id] = kind
+                        lines.append(f"{game_id}\t{kind}\n")
+                    delta.adopt(segment_path)
+            with open(self.index_path, 'a', encoding='utf-8') as file:
+                file.writelines(lines)
+        return updated
+
+    # Write the pending upserts to the catalog files and rebuild the ID-keyed view
+    def finalize(self):
+        with self._lock:
+            valid_segments = self.valid_delta.drain()
+            invalid_segments = self.invalid_delta.drain()
+            if not valid_segments and not invalid_segments:
+                return False
+            return self._write_catalog(valid_segments, invalid_segments)
+
+    # Write the games the bot upserted to the catalog files without waiting for a crawl, so that the bot can
+    # empty its patch log. Returns False when there was nothing to fold or a catalog file could not be read
+    def fold_patches(self):
+        if not os.path.exists(self.valid_path):
+            # Without the crawler's catalog file the patches would be written over an empty catalog
+            return False
+        with self._lock:
+            return self._write_catalog([], [])
+
+    # Apply the sealed patch segments and the given delta segments to the catalog files and remove them,
+    # the caller holds the lock
+    def _write_catalog(self, valid_segments, invalid_segments):
+        with catalog_file_lock(self.lock_path):
+            # Games the bot refreshed since the last write, the games crawled in this run are newer still
+            patch_segments = [path for path in self.patches.segments() if read_footer(path) is not None]
+            if not valid_segments and not invalid_segments and not patch_segments:
+                return False
+
+            valid_list = load_games(self.valid_path)
+            invalid_list = load_games(self.invalid_path)
+            if valid_list is None or invalid_list is None:
+                # Keep the pending segments rather than overwrite a catalog file that could not be read
+                return False
+
+            valid_games = {normalize_id(game.get("ID")): game for game in valid_list}
+            invalid_games = {normalize_id(game.get("ID")): game for game in invalid_list}
+            for game in self.patches.iter_records(patch_segments):
+                game_id = normalize_id(game.get("ID"))
+                invalid_games.pop(game_id, None)
+                valid_games[game_id] = game
+            for game in self.valid_delta.iter_records(valid_segments):
+                game_id = normalize_id(game.get("ID"))
+                invalid_games.pop(game_id, None)
+                valid_games[game_id] = game
+            for game in self.invalid_delta.iter_records(invalid_segments):
+                game_id = normalize_id(game.get("ID"))
+                if game_id in valid_games and game.get("Name") == "Invalid Game":
+                    # A failed refetch must not drop a game that is already in the catalog
+                    continue
+                valid_games.pop(game_id, None)
+                invalid_games[game_id] = game
+
+            write_json_atomic(list(valid_games.values()), self.valid_path)
+            write_json_atomic(list(invalid_games.values()), self.invalid_path)
+            transformed = {str(game_id): game for game_id, game in valid_games.items()}
+            write_json_atomic(transformed, self.transformed_path)
+            try:
+                # The bot loads this instead of parsing the JSON, it rebuilds the snapshot itself if this fails
+                write_snapshot(GameCatalog(transformed), self.snapshot_path, self.transformed_path)
+            except (OSError, ValueError) as e:
+                print(f"Error writing the catalog snapshot: {e}")
+
+            self.valid_delta.remove(valid_segments)
+            self.invalid_delta.remove(invalid_segments)
+            self.patches.remove(patch_segments)
+            self._ids = {game_id: "valid" for game_id in valid_games}
+            self._ids.update((game_id, "invalid") for game_id in invalid_games)
+            self._write_index()
+            print(f"Catalog written: {len(valid_games)} valid and {len(invalid_games)} invalid games.")
+            return True
@@ -0,0 +1,144 @@
+import gc
+import json
+import marshal
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from game_catalog import GameCatalog
+
+# Binary snapshot of the loaded catalog, written next to the JSON catalog it was built from
+SNAPSHOT_PATH = "SteamAPI/JSON/detailed_games_snapshot.bin"
+CATALOG_PATH = "SteamAPI/JSON/detailed_games_transformed.json"
+
+# Bumped whenever the layout of the snapshot or of the parts it stores changes
+SNAPSHOT_VERSION = 1
+MAGIC = b"STGSNAP\0"
+
+# Magic, version, CRC32 of everything after the prefix, length of the JSON header that follows
+PREFIX = struct.Struct("<8sIIQ")
+
+# Sections start at multiples of this so that the arrays mapped from them are aligned
+ALIGNMENT = 64
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Size and modification time of the JSON catalog, a snapshot built from another version of it is stale
+def source_stamp(source_path):
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# Write the catalog as a snapshot: a JSON header listing the sections, NumPy arrays stored raw so they can
+# be memory-mapped, everything else marshalled
+def write_snapshot(catalog, path=SNAPSHOT_PATH, source_path=CATALOG_PATH):
+    sections = {}
+    blobs = []
+    offset = 0
+    for name, part in catalog.to_snapshot().items():
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            blob = part.tobytes()
+            sections[name] = {"kind": "array", "dtype": part.dtype.str, "shape": list(part.shape)}
+        else:
+            blob = marshal.dumps(part)
+            sections[name] = {"kind": "object"}
+        offset = align(offset)
+        sections[name].update(offset=offset, length=len(blob))
+        blobs.append((offset, blob))
+        offset += len(blob)
+
+    header = json.dumps({"source": source_stamp(source_path), "games": len(catalog),
+                         "sections": sections}).encode('utf-8')
+    data_start = align(PREFIX.size + len(header))
+    checksum = zlib.crc32(header)
+    checksum = zlib.crc32(b"\0" * (data_start - PREFIX.size - len(header)), checksum)
+    position = 0
+    for section_offset, blob in blobs:
+        checksum = zlib.crc32(b"\0" * (section_offset - position), checksum)
+        checksum = zlib.crc32(blob, checksum)
+        position = section_offset + len(blob)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(PREFIX.pack(MAGIC, SNAPSHOT_VERSION, checksum, len(header)))
+        file.write(header)
+        for section_offset, blob in blobs:
+            file.seek(data_start + section_offset)
+            file.write(blob)
+        file.truncate(data_start + position)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    print(f"Catalog snapshot written: {len(catalog)} games, {data_start + position} bytes.")
+
+
+# Load the catalog from its snapshot, None when the snapshot is missing, damaged, from another version
+# or older than the JSON catalog
+def load_snapshot(path=SNAPSHOT_PATH, source_path=CATALOG_PATH):
+    try:
+        with open(path, 'rb') as file:
+            snapshot = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Catalog snapshot could not be opened: {e}")
+        return None
+
+    try:
+        magic, version, checksum, header_length = PREFIX.unpack_from(snapshot, 0)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            print("Catalog snapshot has another format version, loading the JSON catalog.")
+            return None
+        with memoryview(snapshot) as view, view[PREFIX.size:] as body:
+            if zlib.crc32(body) != checksum:
+                print("Catalog snapshot checksum mismatch, loading the JSON catalog.")
+                return None
+        header = json.loads(snapshot[PREFIX.size:PREFIX.size + header_length])
+        stamp = source_stamp(source_path)
+        if stamp is not None and stamp != header["source"]:
+            print("Catalog snapshot is older than the JSON catalog, loading the JSON catalog.")
+            return None
+
+        data_start = align(PREFIX.size + header_length)
+        # The load allocates only acyclic objects, collections during it would only rescan them
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return GameCatalog.from_snapshot(read_sections(snapshot, data_start, header["sections"]))
+        finally:
+            if gc_enabled:
+                gc.enable()
+    except (struct.error, ValueError, KeyError, EOFError, TypeError) as e:
+        print(f"Catalog snapshot could not be read: {e}")
+        return None
+
+
+# Parts stored in the sections of a mapped snapshot, arrays are views of the mapping rather than copies
+def read_sections(snapshot, data_start, sections):
+    parts = {}
+    for name, section in sections.items():
+        start = data_start + section["offset"]
+        if section["kind"] == "array":
+            dtype = np.dtype(section["dtype"])
+            count = int(np.prod(section["shape"]))
+            if count:
+                array = np.frombuffer(snapshot, dtype=dtype, count=count, offset=start)
+            else:
+                array = np.empty(0, dtype=dtype)
+            parts[name] = array.reshape(section["shape"])
+        else:
+            parts[name] = marshal.loads(snapshot[start:start + section["length"]])
+    return parts
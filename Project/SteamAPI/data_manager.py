@@ -1,31 +1,147 @@
+import io
 import json
-import os
-from difflib import SequenceMatcher
-import asyncio
+import threading
 import yaml
-import datetime
-
-# Global variable to store the database
+from itertools import islice
+
+from catalog_merge import PATCH_DIRECTORY, TRANSFORMED_GAMES_PATH, CatalogMerger
+from catalog_snapshot import load_snapshot, write_snapshot
+from game_catalog import GameCatalog
+from game_record import load_records
+from name_index import normalize_name
+from query_cache import QUERY_CACHE
+from segment_store import SegmentStore
+from wishlist_store import WISHLIST_STORE, SqliteWishlistStore, migrate_json_wishlists, wishlist_key
+from wishlist_export import export_wishlist_file
+from wishlist_view import join_wishlist, sort_entries
+
+# Global variable to store the database, a GameCatalog of compact GameRecords once it is loaded
 DATABASE = None
 
-# Asynchronously preload the database from the JSON file
-async def preload_database():
+# Set once the first load attempt has finished, whether or not it found a catalog
+DATABASE_READY = threading.Event()
+
+# Seconds a handler waits for the catalog while it is still loading
+DATABASE_WAIT_TIMEOUT = 3
+
+# Upserts of single games since the catalog files were last written, replayed over the catalog on every load.
+# Every patch is its own sealed segment so that the crawler can fold complete patches into the catalog files
+PATCH_LOG = SegmentStore(PATCH_DIRECTORY, max_records=1)
+
+# Number of games upserted since the indexes were built after which the patches are written to the catalog files
+PATCH_COMPACT_THRESHOLD = 256
+
+# Number of imported games validated against the catalog and written to the wishlist at a time
+IMPORT_BATCH_SIZE = 200
+
+_loader_thread = None
+_loader_lock = threading.Lock()
+
+_wishlists_migrated = False
+_migration_lock = threading.Lock()
+
+# Taken by everything that replaces DATABASE, readers only read the reference and never wait for it
+_writer_lock = threading.Lock()
+_compaction_thread = None
+# Number of patched games the next compaction waits for, raised after a compaction that could not write the files
+_compaction_size = PATCH_COMPACT_THRESHOLD
+
+# Replace the database in a single assignment, the caller holds the writer lock
+def swap_database(catalog):
     global DATABASE
+    catalog.version = DATABASE.version + 1 if DATABASE is not None else 1
+    DATABASE = catalog
+    # Entries of older versions can no longer be hit, they are dropped rather than left to be evicted
+    QUERY_CACHE.clear()
+
+# Load the database from its snapshot, or from the JSON file when the snapshot is missing or stale, and replay
+# the patch log over it. The catalog is built off to the side and swapped in once complete
+def preload_database():
     try:
-        with open("SteamAPI/JSON/detailed_games_transformed.json", 'r', encoding='utf-8') as f:
-            DATABASE = json.load(f)
-            print("Database preloaded successfully.")
+        catalog = load_snapshot()
+        from_json = catalog is None
+        if from_json:
+            with open(TRANSFORMED_GAMES_PATH, 'r', encoding='utf-8') as f:
+                catalog = GameCatalog(load_records(f))
+        with _writer_lock:
+            # Read under the lock so that an upsert cannot land between reading the log and the swap
+            patches = list(PATCH_LOG.iter_records(PATCH_LOG.segments()))
+            swap_database(catalog.upsert(patches) if patches else catalog)
+        print("Database preloaded successfully." if from_json else "Database preloaded from snapshot.")
+        # Handlers can use the catalog while its snapshot is written
+        DATABASE_READY.set()
+        if from_json:
+            try:
+                write_snapshot(catalog)
+            except OSError as e:
+                print("Error writing the database snapshot:", e)
     except FileNotFoundError:
         print("JSON database file not found.")
     except json.JSONDecodeError as e:
         print("Error decoding JSON data:", e)
-
-# Run the preload_database coroutine to load the database at startup
-asyncio.run(preload_database())
-
-# Function to read the preloaded database
-def read_database():
+    finally:
+        DATABASE_READY.set()
+
+# Add or replace one game: logged to the patch log, then applied to a new catalog that is swapped in
+def upsert_game(game):
+    global _compaction_thread
+    with _writer_lock:
+        PATCH_LOG.append(game)
+        if DATABASE is None:
+            # Replayed by the load that is still running
+            return None
+        swap_database(DATABASE.upsert([game]))
+        catalog = DATABASE
+        if len(catalog.patched) >= _compaction_size and _compaction_thread is None:
+            _compaction_thread = threading.Thread(target=compact_database, name="database-compaction", daemon=True)
+            _compaction_thread.start()
+    return catalog
+
+# Fold the patch log into the crawler's catalog files and the snapshot through the same merge the crawler uses,
+# then rebuild the indexes. The patches stay in the log when the catalog files cannot be rewritten, and the next
+# attempt waits for another PATCH_COMPACT_THRESHOLD upserts instead of starting again on every upsert
+def compact_database():
+    global _compaction_thread, _compaction_size
+    try:
+        with _writer_lock:
+            catalog = DATABASE
+            if catalog is None or not catalog.patched:
+                return
+            try:
+                folded = CatalogMerger().fold_patches()
+            except OSError as e:
+                print("Error compacting the database:", e)
+                folded = False
+            if not folded:
+                _compaction_size = len(catalog.patched) + PATCH_COMPACT_THRESHOLD
+                print(f"Database compaction skipped, the patches stay in the patch log until "
+                      f"{_compaction_size} games are patched.")
+                return
+            swap_database(GameCatalog(catalog.games))
+            _compaction_size = PATCH_COMPACT_THRESHOLD
+            print(f"Database compacted: {len(catalog.patched)} patched games written.")
+    finally:
+        _compaction_thread = None
+
+# Start loading the database in a background thread so that the bot can start polling meanwhile
+def start_database_preload():
+    global _loader_thread
+    with _loader_lock:
+        if _loader_thread is None:
+            _loader_thread = threading.Thread(target=preload_database, name="database-preload", daemon=True)
+            _loader_thread.start()
+    return _loader_thread
+
+# Whether the first load attempt has finished
+def is_database_ready():
+    return DATABASE_READY.is_set()
+
+# Function to read the preloaded database, waits up to timeout seconds while it is still loading
+def read_database(timeout=DATABASE_WAIT_TIMEOUT):
     global DATABASE
+    if not DATABASE_READY.wait(timeout):
+        print("Database is still loading.")
+        return None
     if DATABASE is None:
         print("Database is not loaded.")
         return None
@@ -33,92 +149,59 @@ def read_database():
         print("Connected to JSON database successfully.")
         return DATABASE
 
+# Wrap a raw dict of games in a GameCatalog, the loaded DATABASE already is one
+def as_catalog(database):
+    return database if isinstance(database, GameCatalog) else GameCatalog(database)
 
-def parse_release_date(date_str):
-    try:
-        return datetime.datetime.strptime(date_str, "%b %d, %Y")
-    except ValueError:
-        try:
-            return datetime.datetime.strptime(date_str, "%Y")
-        except ValueError:
-            return None
 
+# Wishlist joined against the catalog, one WishlistEntry with numeric sort keys per game
+def enrich_wishlist(wishlist, database):
+    return join_wishlist(wishlist, as_catalog(database))
 
-def sort_wishlist_by_date(wishlist, database):
-    sorted_wishlist = []
-    for game in wishlist:
-        game_id = game.get('ID')
-        if game_id:
-            db_game = find_game_by_exact_id(game_id, database)
-            if db_game:
-                release_date = db_game[0].get('ReleaseDate')
-                parsed_date = parse_release_date(release_date)
-                if parsed_date:
-                    sorted_wishlist.append((game, parsed_date))
 
-    sorted_wishlist.sort(key=lambda x: x[1], reverse=True)
-    return [game for game, date in sorted_wishlist]
+# Wishlist games with a known release date, newest first
+def sort_wishlist_by_date(wishlist, database):
+    entries = [entry for entry in enrich_wishlist(wishlist, database) if entry.release > 0]
+    return [entry.game for entry in sort_entries(entries, "release")]
 
 
+# Wishlist games found in the catalog, most reviewed first
 def sort_wishlist_by_reviews(wishlist, database):
-    sorted_wishlist = []
-    for game in wishlist:
-        game_id = game.get('ID')
-        if game_id:
-            db_game = find_game_by_exact_id(game_id, database)
-            if db_game:
-                positive_reviews = db_game[0].get('PositiveReviews', 0)
-                negative_reviews = db_game[0].get('NegativeReviews', 0)
-                total_reviews = positive_reviews + negative_reviews
-                sorted_wishlist.append((game, total_reviews))
-
-    sorted_wishlist.sort(key=lambda x: x[1], reverse=True)
-    return [game for game, reviews in sorted_wishlist]
-
-# Function to find games by name
-def find_games_by_name(game_name, database):
+    entries = [entry for entry in enrich_wishlist(wishlist, database) if entry.details is not None]
+    return [entry.game for entry in sort_entries(entries, "total_reviews")]
+
+# Searches of the live catalog go through the query cache, other catalogs are searched directly
+def cached_search(kind, query, limit, catalog, search):
+    if catalog is not DATABASE:
+        return search()
+    return QUERY_CACHE.get_or_compute(kind, query, limit, catalog.version, search)
+
+# Function to find games by name, substring and fuzzy matches are looked up through the trigram index
+def find_games_by_name(game_name, database, limit=10):
     print("Search games by name has been started.")
-    results = {}
-    search_query = game_name.lower().replace(" ", "")
-    for game_id, game_data in database.items():
-        name = game_data["Name"].lower().replace(" ", "")
-        ratio = SequenceMatcher(None, search_query, name).ratio()
-        if ratio > 0.7 or search_query in name:
-            total_reviews = game_data["PositiveReviews"] + game_data["NegativeReviews"]
-            results[game_id] = (game_data, total_reviews)
-
-    sorted_results = sorted(results.items(), key=lambda x: x[1][1], reverse=True)
+    catalog = as_catalog(database)
+    results = cached_search("name", normalize_name(game_name), limit, catalog,
+                            lambda: catalog.search_by_name(game_name, limit=limit))
     print("Search games by name is done.")
-    return sorted_results[:10]
+    return results
 
-# Function to find games by tag
-def find_games_by_tag(searchTag, database):
+# Function to find games by tag, the posting lists of the matching tags are already ordered by reviews
+def find_games_by_tag(searchTag, database, limit=20):
     print("Search games by tag has been started.")
-    results = {}
-    for game_id, game_data in database.items():
-        if isinstance(game_data.get("TopTags"), list):
-            top_tags = game_data["TopTags"]
-            if any(searchTag.lower() in tag.lower() for tag in top_tags):
-                total_reviews = game_data["PositiveReviews"] + game_data["NegativeReviews"]
-                results[game_id] = (game_data, total_reviews)
-    sorted_results = sorted(results.items(), key=lambda x: x[1][1], reverse=True)
+    catalog = as_catalog(database)
+    results = cached_search("tag", searchTag.lower(), limit, catalog,
+                            lambda: catalog.search_by_tag(searchTag, limit=limit))
     print("Search games by tag is done.")
-    return sorted_results[:20]
+    return results
 
-# Function to find a game by exact name
+# Function to find a game by exact name, the most reviewed game with the name is returned
 def find_game_by_exact_name(game_name, database):
     print("Search game by exact name has been started.")
-    results = []
-    search_query = game_name.lower().strip()
-    for game_id, game_data in database.items():
-        name = game_data["Name"].lower().strip()
-        if name == search_query:
-            total_reviews = game_data["PositiveReviews"] + game_data["NegativeReviews"]
-            results.append((game_data, total_reviews))
-
-    sorted_results = sorted(results, key=lambda x: x[1], reverse=True)
+    game_data = as_catalog(database).get_by_name(game_name)
     print("Search game by exact name is done.")
-    return sorted_results[:1]
+    if game_data is None:
+        return []
+    return [(game_data, game_data["PositiveReviews"] + game_data["NegativeReviews"])]
 
 # Function to format a list of games for display
 def format_game_list(games):
@@ -132,20 +215,21 @@ def format_game_list(games):
                     f"\tPositive: {positive_percentage:.2f}%\n")
     return message
 
-# Function to get the path of a user's wishlist
-def get_wishlist_path(user_id):
-    # Убедитесь, что путь корректен и существует
-    directory = os.path.join(os.getcwd(), "wishlists")
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-    return os.path.join(directory, f"{user_id}.json")
-
-# Function to read a user's wishlist from file
+# Wishlist store of the bot, the JSON wishlists left from before the SQLite backend are imported on first use
+def wishlist_store():
+    global _wishlists_migrated
+    if not _wishlists_migrated:
+        with _migration_lock:
+            if not _wishlists_migrated:
+                if isinstance(WISHLIST_STORE.store, SqliteWishlistStore):
+                    migrate_json_wishlists(WISHLIST_STORE.store)
+                _wishlists_migrated = True
+    return WISHLIST_STORE
+
+# Function to read a user's wishlist
 def read_wishlist(user_id):
     try:
-        file_path = get_wishlist_path(user_id)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        return wishlist_store().read(user_id)
     except json.JSONDecodeError as e:
         print(f"Error reading wishlist for user {user_id}: {e}")
         return []
@@ -153,195 +237,139 @@ def read_wishlist(user_id):
         print(f"Unexpected error reading wishlist for user {user_id}: {e}")
         return []
 
-# Function to save a user's wishlist to file
+# Function to save a user's wishlist, replacing the stored one
 def save_wishlist(user_id, wishlist):
-    filename = get_wishlist_path(user_id)
-    with open(filename, 'w', encoding='utf-8') as file:
-        print("Save wishlist for user: ", user_id)
-        json.dump(wishlist, file, indent=4)
+    print("Save wishlist for user: ", user_id)
+    wishlist_store().replace(user_id, wishlist)
 
 # Function to add a game to a user's wishlist
 def add_game_to_wishlist(user_id, game):
-    wishlist = read_wishlist(user_id)
-    if game not in wishlist:
-        wishlist.append(game)
-        save_wishlist(user_id, wishlist)
+    if wishlist_store().add(user_id, game):
         print("Add game to wishlist of user: ", user_id)
-    return wishlist
 
 # Function to check if a game is in a user's wishlist
 def check_wishlist(user_id, game_name):
-    wishlist = read_wishlist(user_id)
-    for game in wishlist:
-        if game['Name'] == game_name:
-            return True
-    return False
+    return wishlist_store().contains_name(user_id, game_name)
 
 # Function to get the count of games in a user's wishlist
 def get_wishlist_count(user_id):
-    wishlist = read_wishlist(user_id)
-    return len(wishlist)
+    return wishlist_store().count(user_id)
 
 # Function to remove a game from a user's wishlist
 def remove_game_from_wishlist(user_id, game_name):
     print("Remove game from wishlist of user: ", user_id)
-    wishlist = read_wishlist(user_id)
-    new_wishlist = [game for game in wishlist if game['Name'] != game_name]
-    save_wishlist(user_id, new_wishlist)
-    return new_wishlist
-
-# Function to generate a wishlist file in text format
-def generate_wishlist_file_txt(user_id):
-    wishlist = read_wishlist(user_id)
-    filename = f'wishlist_{user_id}.txt'
-    with open(filename, 'w', encoding='utf-8') as file:
-        for game in wishlist:
-            price = f"{game['Price']}" if game['Price'] != 0.0 else 'Free'
-            file.write(f"{game['ID']}: {game['Name']} - {price}\n")
-    return filename
-
-# Function to filter wishlist fields for exporting
-def filter_wishlist_fields(wishlist):
-    filtered_wishlist = []
-    for game in wishlist:
-        filtered_game = {
-            'ID': game['ID'],
-            'Name': game['Name'],
-            'Price': f"{game['Price']}" if game['Price'] != 0.0 else 'Free'
-        }
-        filtered_wishlist.append(filtered_game)
-    return filtered_wishlist
-
-# Function to generate a wishlist file in JSON format
-def generate_wishlist_file_json(user_id):
-    wishlist = read_wishlist(user_id)
-    filtered_wishlist = filter_wishlist_fields(wishlist)
-    filename = f'wishlist_{user_id}.json'
-    with open(filename, 'w', encoding='utf-8') as file:
-        json.dump(filtered_wishlist, file, ensure_ascii=False, indent=4)
-    return filename
-
-# Function to generate a wishlist file in YAML format
-def generate_wishlist_file_yaml(user_id):
-    wishlist = read_wishlist(user_id)
-    filtered_wishlist = filter_wishlist_fields(wishlist)
-    filename = f'wishlist_{user_id}.yaml'
-    with open(filename, 'w', encoding='utf-8') as file:
-        yaml.dump(filtered_wishlist, file, allow_unicode=True)
-    return filename
-
-# Function to read a user's wishlist from a JSON file
-def read_json_wishlist(user_id):
-    filename = get_wishlist_path(user_id)
-    try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            existing_data = json.load(file)
-    except FileNotFoundError:
-        return []
+    wishlist_store().remove_by_name(user_id, game_name)
 
-    return existing_data
+# Function to export a user's wishlist in one of EXPORT_FORMATS, returns an in-memory file and its name
+def export_wishlist(user_id, export_format):
+    return export_wishlist_file(user_id, read_wishlist(user_id), export_format)
 
 # Function to find a game by exact ID
 def find_game_by_exact_id(game_id, database):
     print("Search game by exact id has been started.")
-    results = []
-    search_query = str(game_id).strip()
-    for db_game_id, game_data in database.items():
-        db_game_id_str = str(game_data["ID"]).strip()
-        if db_game_id_str == search_query:
-            results.append(game_data)
+    game_data = as_catalog(database).get_by_id(game_id)
     print("Search game by exact id is done.")
-    return results[:1]
-
-# Function to import a wishlist from external data
-def import_wishlist(user_id, imported_data):
-    existing_data = read_json_wishlist(user_id)
-
-    existing_data.extend(imported_data)
-
-    filename = get_wishlist_path(user_id)
-    with open(filename, 'w', encoding='utf-8') as file:
-        json.dump(existing_data, file, ensure_ascii=False, indent=4)
-
-# Function to read a wishlist from a file
-def read_wishlist_file(filepath):
-    try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return []
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON data from {filepath}: {e}")
-        return []
-
-# Function to merge wishlists
-def merge_wishlists(user_id, imported_data):
-    current_wishlist = read_wishlist(user_id)
-
-    for game in imported_data:
-        if game not in current_wishlist:
-            current_wishlist.append(game)
-
-    save_wishlist(user_id, current_wishlist)
-
-# Function to update a user's wishlist with imported data
-def update_wishlist(user_id, imported_data):
-    current_wishlist = read_wishlist(user_id)
-
-    for game in imported_data:
-        game_id = game.get('ID')
-        game_name = game.get('Name')
-        game_price = game.get('Price')
-
-        if game_id and game_name:
-            existing_game_by_id = find_game_by_exact_id(game_id, DATABASE)
-            existing_game_by_name = find_game_by_exact_name(game_name, DATABASE)
-
-            if existing_game_by_id and existing_game_by_name:
-                game_info = {
-                    'ID': game_id,
-                    'Name': game_name,
-                    'Price': game_price
-                }
-                if game_info not in current_wishlist:
-                    current_wishlist.append(game_info)
-                else:
-                    print(f"Game with ID {game_id} and Name {game_name} exists on the wishlist.")
+    return [game_data] if game_data is not None else []
+
+# Function to update a user's wishlist with imported data, see import_wishlist_stream
+def update_wishlist(user_id, imported_data, database=None, progress=None):
+    if database is None:
+        database = read_database()
+    return import_wishlist_stream(user_id, imported_data, database, progress=progress)
+
+# Split an iterable into lists of at most size items without reading ahead of the current batch
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# Function to import a stream of games into a wishlist. Every batch is checked against the catalog indexes,
+# games whose ID and name are both in the catalog are added unless the wishlist already has their ID.
+# progress, when given, is called with the counters after every batch; the final counters are returned
+def import_wishlist_stream(user_id, games, database, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    catalog = as_catalog(database)
+    store = wishlist_store()
+    seen = set(wishlist_key(game) for game in store.read(user_id))
+    counts = {"processed": 0, "added": 0, "duplicates": 0, "not_found": 0, "invalid": 0}
+
+    for batch in batches(games, batch_size):
+        valid = []
+        for game in batch:
+            if isinstance(game, dict) and game.get('ID') and game.get('Name'):
+                valid.append(game)
             else:
+                print(f"Invalid game data received: {game}")
+                counts["invalid"] += 1
+        positions = catalog.get_positions(game['ID'] for game in valid).tolist()
+
+        new_games = []
+        for game, position in zip(valid, positions):
+            game_id = game['ID']
+            game_name = game['Name']
+            if position < 0 or catalog.get_by_name(game_name) is None:
                 print(f"Game with ID {game_id} and Name {game_name} not found in the database.")
-        else:
-            print(f"Invalid game data received: ID={game_id}, Name={game_name}")
-
-    save_wishlist(user_id, current_wishlist)
-
-# Function to read a TXT file and parse the wishlist data
-def read_txt_file(file_content):
-    imported_data = []
-    lines = file_content.decode('utf-8').strip().split('\n')
-    for line in lines:
+                counts["not_found"] += 1
+                continue
+            game_info = {
+                'ID': game_id,
+                'Name': game_name,
+                'Price': game.get('Price')
+            }
+            key = wishlist_key(game_info)
+            if key in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(key)
+            new_games.append(game_info)
+
+        counts["added"] += store.extend(user_id, new_games)
+        counts["processed"] += len(batch)
+        if progress is not None:
+            progress(dict(counts))
+
+    print(f"Wishlist import of user {user_id}: {counts}")
+    return counts
+
+# Function to parse a TXT wishlist line by line, yields a game for every line and None for lines that cannot be parsed
+def iter_txt_file(file_content):
+    for line in io.StringIO(file_content.decode('utf-8')):
+        line = line.strip()
+        if not line:
+            continue
         last_dash_index = line.rfind(' - ')
-        if last_dash_index != -1:
-            id_and_name = line[:last_dash_index]
-            price = line[last_dash_index + 3:]
-
-            first_colon_index = id_and_name.find(':')
-            if first_colon_index != -1:
-                game_id = id_and_name[:first_colon_index].strip()
-                game_name = id_and_name[first_colon_index + 1:].strip()
-                game_info = {
-                    'ID': int(game_id),
-                    'Name': game_name,
-                    'Price': price.strip()
-                }
-                imported_data.append(game_info)
-            else:
-                print(f"Error parsing line (ID and Name): {line}")
-        else:
+        if last_dash_index == -1:
             print(f"Error parsing line (Price): {line}")
+            yield None
+            continue
+        id_and_name = line[:last_dash_index]
+        price = line[last_dash_index + 3:]
+
+        first_colon_index = id_and_name.find(':')
+        if first_colon_index == -1:
+            print(f"Error parsing line (ID and Name): {line}")
+            yield None
+            continue
+        game_id = id_and_name[:first_colon_index].strip()
+        game_name = id_and_name[first_colon_index + 1:].strip()
+        try:
+            game_id = int(game_id)
+        except ValueError:
+            print(f"Error parsing line (ID): {line}")
+            yield None
+            continue
+        yield {
+            'ID': game_id,
+            'Name': game_name,
+            'Price': price.strip()
+        }
 
-    return imported_data
-
-# Function to read a YAML file and parse the wishlist data
-def read_yaml_file(file_content):
+# Function to parse a YAML wishlist, yields its games one by one
+def iter_yaml_file(file_content):
     imported_data = yaml.safe_load(file_content)
-    return imported_data if imported_data is not None else []
\ No newline at end of file
+    if isinstance(imported_data, list):
+        yield from imported_data
+    elif imported_data is not None:
+        yield imported_data
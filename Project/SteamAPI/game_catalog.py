@@ -0,0 +1,221 @@
+import numpy as np
+
+from catalog_columns import CatalogColumns
+from game_record import GameRecord, records_from_snapshot, records_to_snapshot
+from name_index import NameIndex, normalize_name
+from tag_index import TagIndex
+
+
+# Form in which exact names are compared: lower case without surrounding spaces
+def normalize_exact_name(name):
+    return name.lower().strip()
+
+
+# Games of the transformed catalog with hash indexes by ID and by name, numeric columns and the search indexes.
+# A catalog is not changed once built, upsert returns a new one that shares the search indexes and keeps the
+# games upserted since they were built in small delta indexes
+class GameCatalog:
+    def __init__(self, games):
+        self.games = games
+        self.game_ids = list(games.keys())
+        self.records = list(games.values())
+        self.columns = CatalogColumns(self.records)
+        self._by_id = {}
+        self._by_name = {}
+        totals = self.columns.total.tolist()
+        for position, game_data in enumerate(self.records):
+            # The first game with an ID wins and the most reviewed game with a name wins, as in the linear scans
+            self._by_id.setdefault(str(game_data["ID"]).strip(), position)
+            name = normalize_exact_name(game_data["Name"])
+            current = self._by_name.get(name)
+            if current is None or totals[position] > totals[current]:
+                self._by_name[name] = position
+        self.name_index = NameIndex(games, self.columns)
+        self.tag_index = TagIndex(games, self.columns)
+        self.version = 0
+        self._set_patched({})
+
+    # Games upserted since the search indexes were built, {game_id: position}, and the delta indexes over them
+    def _set_patched(self, patched):
+        self.patched = patched
+        self.delta_name_index = None
+        self.delta_tag_index = None
+        if patched:
+            delta = {game_id: self.records[position] for game_id, position in patched.items()}
+            columns = CatalogColumns(list(delta.values()))
+            self.delta_name_index = NameIndex(delta, columns)
+            self.delta_tag_index = TagIndex(delta, columns)
+
+    # Parts written to the catalog snapshot, keyed by section name
+    def to_snapshot(self):
+        shared = {}
+        records = [record if isinstance(record, GameRecord) else GameRecord.from_dict(record, shared)
+                   for record in self.records]
+        parts = {
+            "game_ids": self.game_ids,
+            "by_id": self._by_id,
+            "by_name": self._by_name,
+            "patched": self.patched,
+        }
+        for prefix, component_snapshot in (("records", records_to_snapshot(records)),
+                                           ("columns", self.columns.to_snapshot()),
+                                           ("name_index", self.name_index.to_snapshot()),
+                                           ("tag_index", self.tag_index.to_snapshot())):
+            parts.update((f"{prefix}.{name}", part) for name, part in component_snapshot.items())
+        return parts
+
+    # Rebuild a catalog from the parts of a snapshot without recomputing the columns and indexes
+    @classmethod
+    def from_snapshot(cls, parts):
+        catalog = cls.__new__(cls)
+        catalog.game_ids = parts["game_ids"]
+        catalog.records = records_from_snapshot(component_parts(parts, "records"))
+        catalog.games = dict(zip(catalog.game_ids, catalog.records))
+        catalog._by_id = parts["by_id"]
+        catalog._by_name = parts["by_name"]
+        catalog.columns = CatalogColumns.from_snapshot(component_parts(parts, "columns"))
+        catalog.name_index = NameIndex.from_snapshot(component_parts(parts, "name_index"), catalog.game_ids,
+                                                     catalog.records, catalog.columns)
+        catalog.tag_index = TagIndex.from_snapshot(component_parts(parts, "tag_index"), catalog.game_ids,
+                                                   catalog.records, catalog.columns)
+        catalog.version = 0
+        catalog._set_patched(parts.get("patched", {}))
+        return catalog
+
+    # New catalog with the given games added or replaced by ID, later games win over earlier ones with the same ID.
+    # This catalog is left as it is for the readers still using it
+    def upsert(self, games):
+        latest = {}
+        for game in games:
+            record = game if isinstance(game, GameRecord) else GameRecord.from_dict(game)
+            latest[str(record["ID"]).strip()] = record
+
+        catalog = GameCatalog.__new__(GameCatalog)
+        catalog.game_ids = list(self.game_ids)
+        catalog.records = list(self.records)
+        catalog.games = dict(self.games)
+        catalog._by_id = dict(self._by_id)
+        catalog._by_name = dict(self._by_name)
+        positions = []
+        names = set()
+        for game_id, record in latest.items():
+            position = catalog._by_id.get(game_id)
+            if position is None:
+                position = len(catalog.records)
+                catalog.game_ids.append(game_id)
+                catalog.records.append(record)
+                catalog._by_id[game_id] = position
+            else:
+                names.add(normalize_exact_name(catalog.records[position]["Name"]))
+                catalog.records[position] = record
+            catalog.games[catalog.game_ids[position]] = record
+            names.add(normalize_exact_name(record["Name"]))
+            positions.append(position)
+        catalog.columns = self.columns.with_games(positions, [catalog.records[position] for position in positions])
+        catalog.name_index = self.name_index
+        catalog.tag_index = self.tag_index
+        catalog.version = self.version + 1
+        patched = dict(self.patched)
+        patched.update((catalog.game_ids[position], position) for position in positions)
+        catalog._set_patched(patched)
+        catalog._update_names(names)
+        return catalog
+
+    # Recompute the games the given names map to, the names of upserted games may be shared by other games
+    def _update_names(self, names):
+        totals = self.columns.total
+        for name in names:
+            owner = None
+            for position in self._name_candidates(name):
+                if normalize_exact_name(self.records[position]["Name"]) != name:
+                    continue
+                if owner is None or totals[position] > totals[owner] or \
+                        (totals[position] == totals[owner] and position < owner):
+                    owner = position
+            if owner is None:
+                self._by_name.pop(name, None)
+            else:
+                self._by_name[name] = owner
+
+    # Positions of the games that may have the given exact name: those with the same name in the name index, whose
+    # names ignore spaces too, and the games upserted since it was built
+    def _name_candidates(self, name):
+        key = normalize_name(name)
+        order = self.name_index.order
+        candidates = set(self.patched.values())
+        candidates.update(int(order[rank]) for rank, indexed in enumerate(self.name_index.names) if indexed == key)
+        return candidates
+
+    def __len__(self):
+        return len(self.games)
+
+    def __iter__(self):
+        return iter(self.games)
+
+    def __contains__(self, game_id):
+        return game_id in self.games
+
+    def __getitem__(self, game_id):
+        return self.games[game_id]
+
+    def get(self, game_id, default=None):
+        return self.games.get(game_id, default)
+
+    def items(self):
+        return self.games.items()
+
+    def values(self):
+        return self.games.values()
+
+    # Game with the given ID, whether given as a number or a string
+    def get_by_id(self, game_id):
+        position = self._by_id.get(str(game_id).strip())
+        return self.records[position] if position is not None else None
+
+    # Game with the given name, compared case-insensitively
+    def get_by_name(self, game_name):
+        position = self._by_name.get(normalize_exact_name(game_name))
+        return self.records[position] if position is not None else None
+
+    # Games with the given IDs in the same order, None for the IDs not in the catalog
+    def get_many(self, game_ids):
+        return [self.get_by_id(game_id) for game_id in game_ids]
+
+    # Column positions of the games with the given IDs, -1 for the IDs not in the catalog
+    def get_positions(self, game_ids):
+        return np.array([self._by_id.get(str(game_id).strip(), -1) for game_id in game_ids], dtype=np.int64)
+
+    # Games matching a name, as NameIndex.search, with the upserted games taken from the delta index
+    def search_by_name(self, game_name, limit=10):
+        if not self.patched:
+            return self.name_index.search(game_name, limit)
+        return self._merge_delta(self.name_index.search(game_name, limit + len(self.patched)),
+                                 self.delta_name_index.search(game_name, limit), limit)
+
+    # Games with a matching tag, as TagIndex.search, with the upserted games taken from the delta index
+    def search_by_tag(self, search_tag, limit=20):
+        if not self.patched:
+            return self.tag_index.search(search_tag, limit)
+        return self._merge_delta(self.tag_index.search(search_tag, limit + len(self.patched)),
+                                 self.delta_tag_index.search(search_tag, limit), limit)
+
+    # Results of the search indexes without the games upserted since, merged with the results of the delta index
+    # in the order a rebuilt index would give: total reviews, then catalog order
+    def _merge_delta(self, results, delta_results, limit):
+        results = [result for result in results if result[0] not in self.patched]
+        results.extend(delta_results)
+        results.sort(key=lambda result: (-result[1][1], self._by_id.get(str(result[0]).strip(), 0)))
+        return results[:limit]
+
+    # The k best games by a column as (game_id, (game_data, total_reviews)), optionally among a mask of games
+    def top_games(self, column="total", k=20, mask=None):
+        positions = self.columns.top_k(column, k, mask).tolist()
+        totals = self.columns.total[positions].tolist()
+        return [(self.game_ids[position], (self.records[position], total))
+                for position, total in zip(positions, totals)]
+
+
+# Parts of one component of a snapshot, without their prefix
+def component_parts(parts, prefix):
+    prefix += "."
+    return {name[len(prefix):]: part for name, part in parts.items() if name.startswith(prefix)}
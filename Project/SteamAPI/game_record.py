@@ -0,0 +1,146 @@
+import json
+import sys
+from collections import deque
+from itertools import repeat
+
+# Fields of a transformed game record, in the order the crawler writes them
+FIELDS = ("ID", "Name", "ImageURL", "Price", "Developer", "Publisher", "PositiveReviews", "NegativeReviews",
+          "DayPeak", "TopTags", "LanguagesSub", "LanguagesAudio", "ShortDesc", "ReleaseDate", "Platforms")
+FIELD_SET = frozenset(FIELDS)
+
+# String fields shared by many games, interned so that equal values are stored once
+INTERNED_FIELDS = frozenset(("Price", "Developer", "Publisher", "ReleaseDate", "Platforms"))
+
+# List fields, stored as tuples of interned strings, equal tuples are shared between games
+LIST_FIELDS = frozenset(("TopTags", "LanguagesSub", "LanguagesAudio"))
+
+
+# Marks a field the record was loaded without, so that get() falls back to its default as with a dict
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+# Compact read-only game record with the mapping interface of the JSON dict it replaces
+class GameRecord:
+    __slots__ = FIELDS + ("_extra",)
+
+    # Build a record from a game dict, shared holds the tuples already seen during the load
+    @classmethod
+    def from_dict(cls, data, shared=None):
+        if shared is None:
+            shared = {}
+        record = cls.__new__(cls)
+        for field in FIELDS:
+            value = data.get(field, MISSING)
+            if field in INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            elif field in LIST_FIELDS and isinstance(value, list):
+                value = tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+                value = shared.setdefault(value, value)
+            setattr(record, field, value)
+        extra = {key: value for key, value in data.items() if key not in FIELD_SET}
+        record._extra = extra or None
+        return record
+
+    def __getitem__(self, key):
+        if key in FIELD_SET:
+            value = getattr(self, key)
+            if value is not MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def keys(self):
+        keys = [field for field in FIELDS if getattr(self, field) is not MISSING]
+        if self._extra is not None:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    # Plain dict with lists, as written to the JSON files
+    def to_dict(self):
+        return {key: list(value) if key in LIST_FIELDS and isinstance(value, tuple) else value
+                for key, value in self.items()}
+
+    def __eq__(self, other):
+        if isinstance(other, GameRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+# Records as plain data for the catalog snapshot: one list of values per field, the fields a record was loaded
+# without as (position, field index) pairs and the extra keys by position
+def records_to_snapshot(records):
+    fields = []
+    missing = []
+    for index, field in enumerate(FIELDS):
+        values = [getattr(record, field) for record in records]
+        for position, value in enumerate(values):
+            if value is MISSING:
+                values[position] = None
+                missing.append((position, index))
+        fields.append(values)
+    extra = {position: record._extra for position, record in enumerate(records) if record._extra is not None}
+    return {"fields": fields, "missing": missing, "extra": extra}
+
+
+# Rebuild the records of a snapshot, the slots are filled a field at a time to keep the load fast
+def records_from_snapshot(parts):
+    fields = parts["fields"]
+    count = len(fields[0]) if fields else 0
+    records = [GameRecord.__new__(GameRecord) for _ in range(count)]
+    for field, values in zip(FIELDS, fields):
+        deque(map(getattr(GameRecord, field).__set__, records, values), maxlen=0)
+    deque(map(GameRecord._extra.__set__, records, repeat(None, count)), maxlen=0)
+    for position, index in parts["missing"]:
+        setattr(records[position], FIELDS[index], MISSING)
+    for position, extra in parts["extra"].items():
+        records[position]._extra = extra
+    return records
+
+
+# Load a transformed catalog file as {game_id: GameRecord}, converting every game while the file is parsed
+def load_records(file):
+    shared = {}
+
+    def to_record(data):
+        if "ID" in data and "Name" in data:
+            return GameRecord.from_dict(data, shared)
+        return data
+
+    return json.load(file, object_hook=to_record)
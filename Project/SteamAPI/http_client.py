@@ -0,0 +1,60 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connect and read timeouts in seconds used for every request
+DEFAULT_TIMEOUT = (5, 30)
+
+# Keep-alive connections kept per host unless configured otherwise
+DEFAULT_POOL_SIZE = 10
+
+_sessions = {}
+_pool_sizes = {}
+_lock = threading.Lock()
+
+
+# Create a session with a connection pool of the given size that retries connection errors only.
+# Status retries are off and Retry-After is ignored here, so every 429 and 5xx response reaches the caller
+# after one request instead of being slept on while the caller holds its concurrency slot
+def create_session(pool_size=DEFAULT_POOL_SIZE):
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        status=0,
+        backoff_factor=1,
+        status_forcelist=[],
+        allowed_methods=["HEAD", "GET", "OPTIONS"],
+        respect_retry_after_header=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Size the connection pool of a host, e.g. to the crawler's concurrency
+def configure_pool(host, pool_size):
+    with _lock:
+        _pool_sizes[host] = pool_size
+        session = _sessions.pop(host, None)
+    if session is not None:
+        session.close()
+
+
+# Shared keep-alive session of a host
+def get_session(host):
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = create_session(_pool_sizes.get(host, DEFAULT_POOL_SIZE))
+            _sessions[host] = session
+        return session
+
+
+# GET a URL through the pooled session of its host
+def get(url, **kwargs):
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    return get_session(urlsplit(url).netloc).get(url, **kwargs)
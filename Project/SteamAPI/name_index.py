@@ -0,0 +1,140 @@
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from catalog_columns import CatalogColumns
+
+# Similarity above which a name counts as a fuzzy match
+FUZZY_RATIO = 0.7
+
+# Characters counted per name to bound the similarity of fuzzy candidates, the others are counted together
+COUNTED_CHARACTERS = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+# Form in which names are compared: lower case without spaces
+def normalize_name(name):
+    return name.lower().replace(" ", "")
+
+
+# Trigrams of a normalized name, padded so that short names and name boundaries have trigrams too
+def padded_trigrams(name):
+    padded = f"^^{name}$"
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# Occurrences of every counted character in every name, one row per name and a last column for the other characters
+def count_characters(names, lengths):
+    codes = np.frombuffer("".join(names).encode("utf-32-le"), dtype=np.uint32)
+    columns = np.full(0x110000, len(COUNTED_CHARACTERS), dtype=np.int32)
+    columns[[ord(character) for character in COUNTED_CHARACTERS]] = np.arange(len(COUNTED_CHARACTERS))
+    width = len(COUNTED_CHARACTERS) + 1
+    rows = np.repeat(np.arange(len(names), dtype=np.int64), lengths)
+    counts = np.bincount(rows * width + columns[codes], minlength=len(names) * width)
+    return counts.reshape(len(names), width).astype(np.uint16)
+
+
+# Inverted trigram index over the game names of the catalog, games are kept in order of total reviews
+class NameIndex:
+    def __init__(self, database, columns=None):
+        games = list(database.values())
+        if columns is None:
+            columns = CatalogColumns(games)
+        self.order = columns.sort("total")
+        self._attach(list(database.keys()), games, columns)
+        self.names = [normalize_name(game_data["Name"]) for game_data in self.games]
+        self.lengths = np.array([len(name) for name in self.names], dtype=np.int32)
+        postings = {}
+        for rank, name in enumerate(self.names):
+            for trigram in padded_trigrams(name):
+                postings.setdefault(trigram, []).append(rank)
+        self.postings = {trigram: np.array(ranks, dtype=np.int32) for trigram, ranks in postings.items()}
+        self.characters = count_characters(self.names, self.lengths)
+
+    # Games, IDs and review counts in rank order
+    def _attach(self, game_ids, games, columns):
+        order = self.order.tolist()
+        self.ids = [game_ids[position] for position in order]
+        self.games = [games[position] for position in order]
+        self.reviews = columns.total[self.order].tolist()
+
+    # Parts written to the catalog snapshot, the posting lists as one array with offsets
+    def to_snapshot(self):
+        trigrams = list(self.postings)
+        lengths = [len(self.postings[trigram]) for trigram in trigrams]
+        return {
+            "order": self.order.astype(np.int32),
+            "names": self.names,
+            "lengths": self.lengths,
+            "trigrams": trigrams,
+            "offsets": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+            "postings": np.concatenate([self.postings[trigram] for trigram in trigrams] or [np.empty(0, np.int32)]),
+        }
+
+    @classmethod
+    def from_snapshot(cls, parts, game_ids, games, columns):
+        name_index = cls.__new__(cls)
+        name_index.order = parts["order"]
+        name_index._attach(game_ids, games, columns)
+        name_index.names = parts["names"]
+        name_index.lengths = parts["lengths"]
+        offsets = parts["offsets"].tolist()
+        postings = parts["postings"]
+        name_index.postings = {trigram: postings[offsets[i]:offsets[i + 1]]
+                               for i, trigram in enumerate(parts["trigrams"])}
+        name_index.characters = count_characters(name_index.names, name_index.lengths)
+        return name_index
+
+    # Ranks of the names containing the query, ascending, i.e. by total reviews
+    def _substring_ranks(self, query, limit):
+        if len(query) < 3:
+            # Too short for trigrams, the names are scanned in order of total reviews
+            ranks = range(len(self.names))
+        else:
+            # A name containing the query has all its trigrams, only the rarest one's names are checked
+            trigrams = set(query[i:i + 3] for i in range(len(query) - 2))
+            ranks = min((self.postings.get(trigram, ()) for trigram in trigrams), key=len)
+            ranks = ranks.tolist() if len(ranks) else ranks
+        matches = []
+        for rank in ranks:
+            if query in self.names[rank]:
+                matches.append(rank)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    # Names of comparable length with enough characters in common with the query, scored with the similarity ratio
+    # of the linear search
+    def _fuzzy_ranks(self, query, limit):
+        # A ratio above FUZZY_RATIO is only possible for names of comparable length
+        shortest = len(query) * FUZZY_RATIO / (2 - FUZZY_RATIO)
+        longest = len(query) * (2 - FUZZY_RATIO) / FUZZY_RATIO
+        candidates = np.flatnonzero((self.lengths > shortest) & (self.lengths < longest))
+
+        # The characters two names have in common bound the ratio like quick_ratio does, checked for all candidates
+        # at once. Characters that are not counted one by one can match at most as many as both names have. Shared
+        # trigrams are no such bound, a close name can have none of the query's trigrams
+        query_counts = count_characters([query], [len(query)])[0]
+        columns = np.flatnonzero(query_counts)
+        common = np.minimum(self.characters[np.ix_(candidates, columns)], query_counts[columns]).sum(axis=1)
+        bound = 2 * common / (self.lengths[candidates] + len(query))
+        candidates = candidates[bound > FUZZY_RATIO]
+
+        # Scored in order of total reviews, later candidates cannot enter the results once enough matched.
+        # The cheap upper bounds of the ratio reject most candidates before the full comparison
+        matcher = SequenceMatcher(None, query)
+        matches = []
+        for rank in candidates.tolist():
+            matcher.set_seq2(self.names[rank])
+            if matcher.real_quick_ratio() > FUZZY_RATIO and matcher.quick_ratio() > FUZZY_RATIO \
+                    and matcher.ratio() > FUZZY_RATIO:
+                matches.append(rank)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    # Substring and fuzzy matches as (game_id, (game_data, total_reviews)), ranked by total reviews
+    def search(self, game_name, limit=10):
+        query = normalize_name(game_name)
+        ranks = set(self._substring_ranks(query, limit))
+        ranks.update(self._fuzzy_ranks(query, limit))
+        return [(self.ids[rank], (self.games[rank], self.reviews[rank])) for rank in sorted(ranks)[:limit]]
@@ -0,0 +1,120 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+from rate_limiter import parse_retry_after
+from response_cache import RESPONSE_CACHE
+
+# Store endpoint queried for prices, it accepts comma-separated appids when filters=price_overview is set
+STEAM_STORE_URL = "https://store.steampowered.com"
+
+# Number of app IDs per price request
+PRICE_CHUNK_SIZE = 100
+
+# Number of price requests running at the same time
+PRICE_LOOKUP_WORKERS = 4
+
+
+# Extract (price, currency, available) of one game from an appdetails response
+def parse_price(game_id, data):
+    try:
+        if isinstance(data, dict) and data[str(game_id)]['success']:
+            price_data = data[str(game_id)]['data']['price_overview']
+            return price_data['final'] / 100.0, price_data['currency'], True
+        return 0, "USD", False
+    except (KeyError, TypeError):
+        return 0, "USD", False
+
+
+# Times a throttled or failed price request is repeated before its games are given up
+PRICE_MAX_RETRIES = 2
+
+# Longest Retry-After in seconds a price request waits for, the user is waiting for the answer
+PRICE_MAX_RETRY_WAIT = 10
+
+
+# Request the price overview of several games at once, the response has one entry per app ID.
+# A 429 is retried after its Retry-After and a 5xx after a short pause, anything else raises
+def fetch_price_data(game_ids, region):
+    appids = ",".join(str(game_id) for game_id in game_ids)
+    url = f"{STEAM_STORE_URL}/api/appdetails?appids={appids}&cc={region}&filters=price_overview"
+    for attempt in range(PRICE_MAX_RETRIES + 1):
+        response = http_client.get(url)
+        if response.status_code != 429 and response.status_code < 500:
+            break
+        delay = parse_retry_after(response.headers.get("Retry-After"))
+        if response.status_code == 429 and delay is None:
+            break
+        delay = delay if delay is not None else 2 ** attempt
+        if attempt == PRICE_MAX_RETRIES or delay > PRICE_MAX_RETRY_WAIT:
+            break
+        print(f"Price request answered {response.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+    response.raise_for_status()
+    data = response.json()
+    if not isinstance(data, dict):
+        raise ValueError(f"Unexpected price response for {len(game_ids)} games")
+    return data
+
+
+# Appdetails entry of one game requested on its own, None when the request fails
+def fetch_single_price(game_id, region):
+    try:
+        return fetch_price_data([game_id], region).get(str(game_id))
+    except (ValueError, requests.exceptions.RequestException) as e:
+        print(f"Failed to fetch the price of game {game_id}: {e}")
+        return None
+
+
+# Fetch the prices of one chunk and cache them per game. Only the games missing from the answer, or all of them
+# when the answer is malformed, are fetched one by one and concurrently. A throttled or failed chunk request
+# fails the chunk instead of multiplying the requests
+def fetch_price_chunk(game_ids, region):
+    try:
+        data = fetch_price_data(game_ids, region)
+    except ValueError as e:
+        # Also the JSON decoding errors, which are request exceptions as well
+        print(f"Malformed price response for {len(game_ids)} games, fetching them one by one: {e}")
+        data = {}
+    except requests.exceptions.RequestException as e:
+        print(f"Price request for {len(game_ids)} games failed: {e}")
+        return {game_id: (0, "USD", False) for game_id in game_ids}
+
+    entries = {game_id: data.get(str(game_id)) for game_id in game_ids}
+    missing = [game_id for game_id, entry in entries.items() if entry is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=PRICE_LOOKUP_WORKERS) as executor:
+            entries.update(zip(missing, executor.map(fetch_single_price, missing, [region] * len(missing))))
+
+    results = {}
+    for game_id, entry in entries.items():
+        if entry is None:
+            results[game_id] = (0, "USD", False)
+            continue
+        RESPONSE_CACHE.set("appdetails", game_id, {str(game_id): entry}, region, "price_overview")
+        results[game_id] = parse_price(game_id, {str(game_id): entry})
+    return results
+
+
+# Return {game_id: (price, currency, available)} for the given games in a region,
+# using cached prices and a few concurrent chunked requests for the rest
+def get_steam_prices(game_ids, region):
+    prices = {}
+    missing = []
+    for game_id in dict.fromkeys(game_ids):
+        data = RESPONSE_CACHE.get("appdetails", game_id, region, "price_overview")
+        if data is None:
+            missing.append(game_id)
+        else:
+            prices[game_id] = parse_price(game_id, data)
+
+    chunks = [missing[i:i + PRICE_CHUNK_SIZE] for i in range(0, len(missing), PRICE_CHUNK_SIZE)]
+    if len(chunks) == 1:
+        prices.update(fetch_price_chunk(chunks[0], region))
+    elif chunks:
+        with ThreadPoolExecutor(max_workers=PRICE_LOOKUP_WORKERS) as executor:
+            for results in executor.map(fetch_price_chunk, chunks, [region] * len(chunks)):
+                prices.update(results)
+    return prices
@@ -0,0 +1,78 @@
+import os
+import threading
+
+# Location of the journal of the current crawl
+JOURNAL_PATH = "SteamAPI/JSON/crawl_journal.tsv"
+
+# Number of journal entries between two fsync calls
+SYNC_EVERY = 100
+
+# Outcomes that do not need to be crawled again on resume
+FINISHED_STATUSES = ("valid", "invalid")
+
+
+# Write-ahead journal of the app IDs planned for a crawl and the outcome of every processed one
+class ProgressJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    # Start a new journal with the list of app IDs planned for this crawl
+    def start(self, appids):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write("#plan " + ",".join(str(appid) for appid in appids) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    # Reopen the journal of an interrupted crawl and return the app IDs that still need processing
+    def resume(self):
+        plan = []
+        outcomes = {}
+        with open(self.path, 'r', encoding='utf-8') as file:
+            header = file.readline()
+            if header.startswith("#plan "):
+                plan = [int(appid) for appid in header[len("#plan "):].strip().split(",") if appid]
+            for line in file:
+                if not line.endswith("\n"):
+                    # Entry torn by the crash, the game is simply processed again
+                    break
+                appid, status, _ = line.rstrip("\n").split("\t", 2)
+                outcomes[int(appid)] = status
+        self._file = open(self.path, 'a', encoding='utf-8')
+        finished = sum(1 for status in outcomes.values() if status in FINISHED_STATUSES)
+        failed = sum(1 for status in outcomes.values() if status not in FINISHED_STATUSES)
+        print(f"Journal: {len(plan)} planned, {finished} finished, {failed} failed and retried.")
+        return [appid for appid in plan if outcomes.get(appid) not in FINISHED_STATUSES]
+
+    # Record the outcome of one app ID, does nothing when no crawl journal is open
+    def record(self, appid, status, reason=""):
+        if self._file is None:
+            return
+        reason = " ".join(str(reason).split())
+        with self._lock:
+            self._file.write(f"{appid}\t{status}\t{reason}\n")
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= SYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    # Close the journal, removing it once the crawl has been merged into the catalog
+    def close(self, completed=False):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if completed and self.exists():
+            os.remove(self.path)
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+
+# Number of search results kept, the least recently used ones are evicted above it
+MAX_CACHED_QUERIES = 1024
+
+
+# In-memory LRU cache of name and tag search results, keyed by (kind, normalized query, limit, catalog version)
+# so that results computed on an older catalog are never returned
+class QueryCache:
+    def __init__(self, max_entries=MAX_CACHED_QUERIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Return the cached results or compute and cache them
+    def get_or_compute(self, kind, query, limit, version, compute):
+        key = (kind, query, limit, version)
+        with self._lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return results
+            self.misses += 1
+        results = compute()
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return results
+
+    # Drop every entry, called when the catalog is replaced
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Hit/miss counters and current size of the cache
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+# Cache instance shared by all handlers in the process
+QUERY_CACHE = QueryCache()
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+
+# Token bucket limiting the request rate to a single API host
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    # Add the tokens accumulated since the last update
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Wait until a token is available and take it
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+# Parse a Retry-After header given either in seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+# Additive-increase/multiplicative-decrease limit on the requests in flight to a single API host
+class AIMDController:
+    def __init__(self, initial=2, minimum=1, maximum=16, increase=1.0, decrease=0.5, latency_target=2.0,
+                 default_cooldown=5.0):
+        self.window = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.default_cooldown = default_cooldown
+        self.successes = 0
+        self.throttled = 0
+        self.errors = 0
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    # Block until a request slot is free and no Retry-After cooldown is active
+    def acquire(self):
+        with self._condition:
+            while True:
+                wait = self._cooldown_until - time.monotonic()
+                if wait <= 0 and self._in_flight < int(self.window):
+                    self._in_flight += 1
+                    return
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    # Hold a request slot for the duration of a with block
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    # Grow the window by about one request per window of responses faster than the latency target
+    def on_success(self, latency):
+        with self._condition:
+            self.successes += 1
+            if latency <= self.latency_target:
+                self.window = min(self.maximum, self.window + self.increase / self.window)
+                self._condition.notify_all()
+
+    # Shrink the window on 429 and wait for Retry-After (or a default cooldown) before the next request
+    def on_throttle(self, retry_after=None):
+        with self._condition:
+            self.throttled += 1
+            self._shrink()
+            delay = retry_after if retry_after is not None else self.default_cooldown
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+    # Shrink the window on server errors and connection failures
+    def on_error(self):
+        with self._condition:
+            self.errors += 1
+            self._shrink()
+
+    # Decrease multiplicatively, at most once per latency target so one burst of failures counts once
+    def _shrink(self):
+        now = time.monotonic()
+        if self._last_decrease is None or now - self._last_decrease >= self.latency_target:
+            self.window = max(self.minimum, self.window * self.decrease)
+            self._last_decrease = now
+
+    # Current state of the controller
+    def report(self):
+        with self._condition:
+            return {
+                "window": round(self.window, 2),
+                "in_flight": self._in_flight,
+                "successes": self.successes,
+                "throttled": self.throttled,
+                "errors": self.errors,
+            }
@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Location of the on-disk cache shared by the crawler and the bot
+CACHE_PATH = "SteamAPI/JSON/response_cache.sqlite3"
+
+# Time to live of cached responses per endpoint (or "endpoint:filters"), in seconds
+ENDPOINT_TTLS = {
+    "appdetails": 3 * 3600,
+    "appdetails:price_overview": 30 * 60,
+    "steamspy_appdetails": 12 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# Upper bound of the cached payload size, least recently used entries are evicted above it
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+# On-disk cache of parsed Steam and SteamSpy responses, keyed by (endpoint, appid, cc, filters)
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttls=None, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._size = 0
+
+    # Open the database on first use so that importing the module has no side effects
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload TEXT NOT NULL, "
+                "size INTEGER NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            # Total payload size kept in one row, updated in the same transaction as the responses so that every
+            # process sharing the file sees the size the others left
+            connection.execute("CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY, total INTEGER NOT NULL)")
+            connection.commit()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("INSERT OR IGNORE INTO cache_size (id, total) "
+                               "SELECT 0, COALESCE(SUM(size), 0) FROM responses")
+            connection.commit()
+            self._size = connection.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    # Time to live of an endpoint, a filtered request may have its own
+    def ttl(self, endpoint, filters=None):
+        if filters and f"{endpoint}:{filters}" in self.ttls:
+            return self.ttls[f"{endpoint}:{filters}"]
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    @staticmethod
+    def make_key(endpoint, appid, cc=None, filters=None):
+        return f"{endpoint}|{appid}|{cc or ''}|{filters or ''}"
+
+    # Return the cached payload or None when it is missing or expired
+    def get(self, endpoint, appid, cc=None, filters=None):
+        key = self.make_key(endpoint, appid, cc, filters)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT payload, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl(endpoint, filters):
+                self.misses += 1
+                return None
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    # Store a payload and evict the least recently used entries if the cache grew too large. The size is read and
+    # changed inside the write transaction, other processes writing the same file are accounted for
+    def set(self, endpoint, appid, payload, cc=None, filters=None):
+        key = self.make_key(endpoint, appid, cc, filters)
+        data = json.dumps(payload, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, endpoint, payload, size, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, endpoint, data, size, now, now)
+                )
+                self._resize(connection, size - (row[0] if row else 0))
+                if self._size > self.max_bytes:
+                    self._evict(connection)
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+
+    # Add to the shared total size and remember the result
+    def _resize(self, connection, change):
+        connection.execute("UPDATE cache_size SET total = total + ? WHERE id = 0", (change,))
+        self._size = connection.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+
+    # Delete least recently used entries until the cache is back under 90% of its size limit
+    def _evict(self, connection):
+        target = self.max_bytes * 0.9
+        rows = connection.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        freed = 0
+        for key, size in rows:
+            if self._size - freed <= target:
+                break
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            freed += size
+            self.evictions += 1
+        self._resize(connection, -freed)
+
+    # Return the cached payload or fetch and cache it, None results are not cached
+    def get_or_fetch(self, endpoint, appid, fetch, cc=None, filters=None):
+        payload = self.get(endpoint, appid, cc, filters)
+        if payload is None:
+            payload = fetch()
+            if payload is not None:
+                self.set(endpoint, appid, payload, cc, filters)
+        return payload
+
+    # Hit/miss counters and current size of the cache
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_bytes": self._size,
+        }
+
+
+# Cache instance shared by all callers in the process
+RESPONSE_CACHE = ResponseCache()
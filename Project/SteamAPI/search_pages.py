@@ -0,0 +1,47 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Number of ranked results kept for a search, the pages a user can browse through
+SEARCH_RESULTS_LIMIT = 200
+
+# Seconds a search can be paged through before it has to be run again
+SEARCH_PAGE_TTL = 30 * 60
+
+# Number of searches kept, the oldest ones are dropped above it
+MAX_CACHED_SEARCHES = 512
+
+
+# Ranked search results kept under a short token so that later pages are served without searching again
+class SearchPages:
+    def __init__(self, ttl=SEARCH_PAGE_TTL, max_searches=MAX_CACHED_SEARCHES):
+        self.ttl = ttl
+        self.max_searches = max_searches
+        self._searches = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Keep the results of a search, returns the token its pages are requested with
+    def store(self, results, page_size):
+        token = secrets.token_hex(4)
+        with self._lock:
+            self._searches[token] = (time.monotonic(), page_size, results)
+            while len(self._searches) > self.max_searches:
+                self._searches.popitem(last=False)
+        return token
+
+    # The page starting at offset as (results, total, page_size), None once the search expired
+    def page(self, token, offset):
+        with self._lock:
+            entry = self._searches.get(token)
+            if entry is None:
+                return None
+            stored_at, page_size, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._searches[token]
+                return None
+        return results[offset:offset + page_size], len(results), page_size
+
+
+# Search pages shared by all handlers in the process
+SEARCH_PAGES = SearchPages()
@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import threading
+
+# Maximum number of records written to one segment before it is sealed
+SEGMENT_MAX_RECORDS = 10000
+
+# Key of the footer line written at the end of a sealed segment
+FOOTER_KEY = "__footer__"
+
+
+# Read all records from a segment file, skipping the footer and a torn last line
+def read_segment(segment_path):
+    records = []
+    with open(segment_path, 'rb') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of a segment that was being written when the process stopped
+                continue
+            if FOOTER_KEY in record:
+                continue
+            records.append(record)
+    return records
+
+
+# Read the footer index of a sealed segment, returns None for an unsealed one
+def read_footer(segment_path):
+    with open(segment_path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        if position == 0:
+            return None
+        # Scan backwards to the start of the last line
+        chunk_size = 4096
+        tail = b""
+        while position > 0:
+            step = min(chunk_size, position)
+            position -= step
+            file.seek(position)
+            tail = file.read(step) + tail
+            if tail.count(b"\n") >= 2:
+                break
+        last_line = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+    try:
+        record = json.loads(last_line)
+    except ValueError:
+        return None
+    return record.get(FOOTER_KEY)
+
+
+# Append-only store of JSON Lines segments shared by the crawler worker threads
+class SegmentStore:
+    def __init__(self, directory, max_records=SEGMENT_MAX_RECORDS):
+        self.directory = directory
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._file = None
+        self._active_path = None
+        self._index = {}
+
+    # List all segment files in the order they were written
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".jsonl"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    # Path of the segment numbered after the last one on disk
+    def _next_segment_path(self):
+        os.makedirs(self.directory, exist_ok=True)
+        existing = self.segments()
+        number = int(os.path.basename(existing[-1]).split('.')[0]) + 1 if existing else 1
+        return os.path.join(self.directory, f"{number:06d}.jsonl")
+
+    # Open a new segment for appending
+    def _open_segment(self):
+        self._active_path = self._next_segment_path()
+        self._file = open(self._active_path, 'ab')
+        self._index = {}
+
+    # Write the footer index and close the active segment
+    def _seal(self):
+        footer = {FOOTER_KEY: {"records": len(self._index), "index": self._index}}
+        self._file.write(json.dumps(footer).encode('utf-8') + b"\n")
+        self._file.close()
+        self._file = None
+        self._active_path = None
+        self._index = {}
+
+    # Append one record to the active segment
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n"
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            self._index[str(record.get("ID"))] = offset
+            if len(self._index) >= self.max_records:
+                self._seal()
+
+    # Seal the active segment so that all written records can be consumed
+    def drain(self):
+        with self._lock:
+            if self._file is not None:
+                self._seal()
+            return self.segments()
+
+    # Iterate over the records of the given segments, or of all segments
+    def iter_records(self, segments=None):
+        if segments is None:
+            segments = self.drain()
+        for segment_path in segments:
+            yield from read_segment(segment_path)
+
+    # Find the latest record with the given ID using the segment indexes
+    def find(self, record_id):
+        record_id = str(record_id)
+        with self._lock:
+            if self._file is not None and record_id in self._index:
+                self._file.flush()
+                return self._read_at(self._active_path, self._index[record_id])
+            sealed = [path for path in self.segments() if path != self._active_path]
+        for segment_path in reversed(sealed):
+            footer = read_footer(segment_path)
+            if footer and record_id in footer["index"]:
+                return self._read_at(segment_path, footer["index"][record_id])
+        return None
+
+    # Read a single record at a byte offset of a segment
+    @staticmethod
+    def _read_at(segment_path, offset):
+        with open(segment_path, 'rb') as file:
+            file.seek(offset)
+            return json.loads(file.readline())
+
+    # Move a sealed segment of another store into this one without copying it
+    def adopt(self, segment_path):
+        with self._lock:
+            if self._file is not None:
+                self._seal()
+            target_path = self._next_segment_path()
+            shutil.move(segment_path, target_path)
+            return target_path
+
+    # Delete consumed segments
+    def remove(self, segments):
+        for segment_path in segments:
+            try:
+                os.remove(segment_path)
+            except OSError as e:
+                print(f"Error: {segment_path} : {e.strerror}")
+
+    # Delete every segment of the store
+    def clear(self):
+        self.remove(self.drain())
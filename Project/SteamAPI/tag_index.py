@@ -0,0 +1,58 @@
+import numpy as np
+
+from catalog_columns import CatalogColumns
+
+
+# Posting lists from lower-cased tags to the games carrying them, ordered by total reviews
+class TagIndex:
+    def __init__(self, database, columns=None):
+        games = list(database.values())
+        if columns is None:
+            columns = CatalogColumns(games)
+        tagged = np.fromiter((isinstance(game.get("TopTags"), (list, tuple)) for game in games), dtype=bool,
+                             count=len(games))
+        self.order = columns.sort("total", np.flatnonzero(tagged))
+        self._attach(list(database.keys()), games, columns)
+        postings = {}
+        for rank, game_data in enumerate(self.games):
+            for tag in set(tag.lower() for tag in game_data["TopTags"]):
+                postings.setdefault(tag, []).append(rank)
+        self.postings = {tag: np.array(ranks, dtype=np.int32) for tag, ranks in postings.items()}
+
+    # Games, IDs and review counts in rank order
+    def _attach(self, game_ids, games, columns):
+        order = self.order.tolist()
+        self.ids = [game_ids[position] for position in order]
+        self.games = [games[position] for position in order]
+        self.reviews = columns.total[self.order].tolist()
+
+    # Parts written to the catalog snapshot, the posting lists as one array with offsets
+    def to_snapshot(self):
+        tags = list(self.postings)
+        lengths = [len(self.postings[tag]) for tag in tags]
+        return {
+            "order": self.order.astype(np.int32),
+            "tags": tags,
+            "offsets": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+            "postings": np.concatenate([self.postings[tag] for tag in tags] or [np.empty(0, np.int32)]),
+        }
+
+    @classmethod
+    def from_snapshot(cls, parts, game_ids, games, columns):
+        tag_index = cls.__new__(cls)
+        tag_index.order = parts["order"]
+        tag_index._attach(game_ids, games, columns)
+        offsets = parts["offsets"].tolist()
+        postings = parts["postings"]
+        tag_index.postings = {tag: postings[offsets[i]:offsets[i + 1]] for i, tag in enumerate(parts["tags"])}
+        return tag_index
+
+    # Games with a tag containing the given text as (game_id, (game_data, total_reviews)), ranked by total reviews
+    def search(self, search_tag, limit=20):
+        query = search_tag.lower()
+        # The tag vocabulary is small, matching tags are found by scanning it
+        postings = [ranks[:limit] for tag, ranks in self.postings.items() if query in tag]
+        if not postings:
+            return []
+        ranks = postings[0] if len(postings) == 1 else np.unique(np.concatenate(postings))[:limit]
+        return [(self.ids[rank], (self.games[rank], self.reviews[rank])) for rank in ranks.tolist()]
@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Metrics file rewritten while a crawl runs
+METRICS_PATH = "SteamAPI/JSON/crawl_metrics.json"
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Seconds between two writes of the metrics file
+WRITE_INTERVAL = 5.0
+
+
+# Latency histogram with fixed buckets
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    # Upper bound of the bucket holding the given quantile
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        buckets = {f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+# Stage timings, counters and gauges of the crawl pipeline, written periodically to a JSON file
+class Telemetry:
+    def __init__(self, path=METRICS_PATH, write_interval=WRITE_INTERVAL):
+        self.path = path
+        self.write_interval = write_interval
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._started_at = time.time()
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._writer = None
+
+    # Reset the metrics and start writing them in the background
+    def start(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self._started_at = time.time()
+            self._started = time.monotonic()
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._write_loop, name="telemetry-writer", daemon=True)
+        self._writer.start()
+
+    # Stop the background writer and write the final metrics
+    def stop(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.write()
+
+    def _write_loop(self):
+        while not self._stop.wait(self.write_interval):
+            self.write()
+
+    # Record the duration of a pipeline stage
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    # Time the body of a with block as a pipeline stage
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # Register a callable whose result is included in every snapshot
+    def add_gauge(self, name, read):
+        self._gauges[name] = read
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+        games = counters.get("games_valid", 0) + counters.get("games_invalid", 0) + counters.get("games_failed", 0)
+        return {
+            "started_at": self._started_at,
+            "updated_at": time.time(),
+            "elapsed_seconds": round(elapsed, 2),
+            "games": games,
+            "games_per_second": round(games / elapsed, 3) if elapsed > 0 else 0.0,
+            "counters": counters,
+            "gauges": {name: read() for name, read in self._gauges.items()},
+            "stages": histograms,
+        }
+
+    # Write the current snapshot atomically so it can be read while the crawl runs
+    def write(self):
+        snapshot = self.snapshot()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(snapshot, file, indent=4)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error: Could not write metrics - {e}")
+
+
+# Print a summary of a metrics file, e.g. while a crawl is running
+def print_summary(path=METRICS_PATH):
+    with open(path, 'r', encoding='utf-8') as file:
+        metrics = json.load(file)
+    print(f"Elapsed: {metrics['elapsed_seconds']}s, games: {metrics['games']}, "
+          f"games/sec: {metrics['games_per_second']}")
+    for name, value in sorted(metrics["counters"].items()):
+        print(f"  {name}: {value}")
+    for name, stage in sorted(metrics["stages"].items()):
+        print(f"  {name}: count={stage['count']} mean={stage['mean']}s p50<={stage['p50']}s "
+              f"p95<={stage['p95']}s max={stage['max']}s")
+    for name, value in sorted(metrics["gauges"].items()):
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    print_summary(sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH)
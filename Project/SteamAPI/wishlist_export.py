@@ -0,0 +1,93 @@
+import csv
+import gzip
+import io
+import json
+
+import yaml
+
+# Columns of the CSV export, also the fields every export keeps
+EXPORT_FIELDS = ("ID", "Name", "Price")
+
+
+# Fields of a wishlist game written to the exports, a price of 0.0 is shown as Free
+def export_fields(game):
+    return {
+        'ID': game['ID'],
+        'Name': game['Name'],
+        'Price': f"{game['Price']}" if game['Price'] != 0.0 else 'Free'
+    }
+
+
+# One "ID: Name - Price" line per game, the format read back by the TXT import
+def iter_txt(wishlist):
+    for game in wishlist:
+        game = export_fields(game)
+        yield f"{game['ID']}: {game['Name']} - {game['Price']}\n"
+
+
+# The wishlist as an indented JSON array, written one game at a time
+def iter_json(wishlist):
+    if not wishlist:
+        yield "[]"
+        return
+    yield "[\n"
+    for index, game in enumerate(wishlist):
+        separator = ",\n" if index < len(wishlist) - 1 else "\n"
+        yield "    " + json.dumps(export_fields(game), ensure_ascii=False, indent=4).replace("\n", "\n    ") + separator
+    yield "]"
+
+
+# The wishlist as a YAML list, every game dumped as its own list item
+def iter_yaml(wishlist):
+    if not wishlist:
+        yield yaml.dump([], allow_unicode=True)
+        return
+    for game in wishlist:
+        yield yaml.dump([export_fields(game)], allow_unicode=True)
+
+
+# A header row and one CSV row per game
+def iter_csv(wishlist):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for game in wishlist:
+        writer.writerow(export_fields(game))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+# One JSON object per line
+def iter_jsonl(wishlist):
+    for game in wishlist:
+        yield json.dumps(export_fields(game), ensure_ascii=False) + "\n"
+
+
+# Export formats by the name the user picks: file extension, chunk generator and whether the file is gzipped
+EXPORT_FORMATS = {
+    "txt": ("txt", iter_txt, False),
+    "json": ("json", iter_json, False),
+    "yaml": ("yaml", iter_yaml, False),
+    "csv": ("csv", iter_csv, False),
+    "jsonl": ("jsonl.gz", iter_jsonl, True),
+}
+
+
+# Serialize a wishlist into an in-memory file, returns the buffer positioned at its start and the file name
+# it is sent under, None for an unknown format
+def export_wishlist_file(user_id, wishlist, export_format):
+    if export_format not in EXPORT_FORMATS:
+        return None
+    extension, generate, compressed = EXPORT_FORMATS[export_format]
+    buffer = io.BytesIO()
+    if compressed:
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as file:
+            for chunk in generate(wishlist):
+                file.write(chunk.encode('utf-8'))
+    else:
+        for chunk in generate(wishlist):
+            buffer.write(chunk.encode('utf-8'))
+    buffer.seek(0)
+    return buffer, f"wishlist_{user_id}.{extension}"
@@ -0,0 +1,411 @@
+import atexit
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Directory of the per-user JSON wishlist files
+WISHLIST_DIRECTORY = "wishlists"
+
+# Database holding the wishlists of all users
+WISHLIST_DB_PATH = "wishlists/wishlists.sqlite3"
+
+# Migrated JSON wishlist files are moved here so that they are not imported twice
+MIGRATED_DIRECTORY = "wishlists/migrated_json"
+
+# Backend used by the bot, "sqlite" or "json"
+WISHLIST_BACKEND = "sqlite"
+
+# Number of wishlists kept in memory, the least recently used ones are written back and dropped above it
+MAX_CACHED_WISHLISTS = 1024
+
+# Seconds changed wishlists stay in memory before they are written to the backend
+WISHLIST_FLUSH_INTERVAL = 2.0
+
+
+# Key a game is stored under in a wishlist, games without an ID are kept but never deduplicated
+def wishlist_key(game):
+    game_id = game.get('ID') if isinstance(game, dict) else None
+    return str(game_id) if game_id is not None else None
+
+
+# Wishlists as one JSON file per user, the original layout
+class JsonWishlistStore:
+    def __init__(self, directory=WISHLIST_DIRECTORY):
+        self.directory = directory
+        self._directory_ready = False
+
+    def path(self, user_id):
+        if not self._directory_ready:
+            os.makedirs(self.directory, exist_ok=True)
+            self._directory_ready = True
+        return os.path.join(self.directory, f"{user_id}.json")
+
+    # Games of a user in the order they were added, an empty list for a user without a wishlist
+    def read(self, user_id):
+        try:
+            with open(self.path(user_id), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+
+    # Replace the whole wishlist of a user
+    def replace(self, user_id, wishlist):
+        with open(self.path(user_id), 'w', encoding='utf-8') as file:
+            json.dump(wishlist, file, indent=4)
+
+    # Add the games that are not in the wishlist yet, returns the number added
+    def extend(self, user_id, games):
+        wishlist = self.read(user_id)
+        keys = set(wishlist_key(game) for game in wishlist)
+        added = 0
+        for game in games:
+            key = wishlist_key(game)
+            if key is None or key not in keys:
+                wishlist.append(game)
+                keys.add(key)
+                added += 1
+        if added:
+            self.replace(user_id, wishlist)
+        return added
+
+    def add(self, user_id, game):
+        return self.extend(user_id, [game]) == 1
+
+    # Remove every game with the given name, returns the number removed
+    def remove_by_name(self, user_id, game_name):
+        wishlist = self.read(user_id)
+        kept = [game for game in wishlist if game['Name'] != game_name]
+        if len(kept) != len(wishlist):
+            self.replace(user_id, kept)
+        return len(wishlist) - len(kept)
+
+    def contains_name(self, user_id, game_name):
+        return any(game['Name'] == game_name for game in self.read(user_id))
+
+    def count(self, user_id):
+        return len(self.read(user_id))
+
+
+# Wishlists of all users in one SQLite database in WAL mode, one row per (user_id, app_id)
+class SqliteWishlistStore:
+    def __init__(self, path=WISHLIST_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    # Open the database on first use so that importing the module has no side effects
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # With WAL a commit is durable once the log is synced at a checkpoint, not on every write
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS wishlist_games ("
+                "row_id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, app_id TEXT, name TEXT, game TEXT NOT NULL, "
+                "UNIQUE (user_id, app_id))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS wishlist_games_name ON wishlist_games (user_id, name)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _rows(user_id, games):
+        return [(str(user_id), wishlist_key(game), game.get('Name'), json.dumps(game, ensure_ascii=False))
+                for game in games]
+
+    def read(self, user_id):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT game FROM wishlist_games WHERE user_id = ? ORDER BY row_id", (str(user_id),)).fetchall()
+        return [json.loads(game) for game, in rows]
+
+    def replace(self, user_id, wishlist):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM wishlist_games WHERE user_id = ?", (str(user_id),))
+                connection.executemany(
+                    "INSERT OR IGNORE INTO wishlist_games (user_id, app_id, name, game) VALUES (?, ?, ?, ?)",
+                    self._rows(user_id, wishlist))
+
+    # Add the games that are not in the wishlist yet in one transaction, returns the number added
+    def extend(self, user_id, games):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                before = connection.total_changes
+                connection.executemany(
+                    "INSERT OR IGNORE INTO wishlist_games (user_id, app_id, name, game) VALUES (?, ?, ?, ?)",
+                    self._rows(user_id, games))
+                return connection.total_changes - before
+
+    def add(self, user_id, game):
+        return self.extend(user_id, [game]) == 1
+
+    def remove_by_name(self, user_id, game_name):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute("DELETE FROM wishlist_games WHERE user_id = ? AND name = ?",
+                                          (str(user_id), game_name)).rowcount
+
+    def contains_name(self, user_id, game_name):
+        with self._lock:
+            row = self._connect().execute("SELECT 1 FROM wishlist_games WHERE user_id = ? AND name = ? LIMIT 1",
+                                          (str(user_id), game_name)).fetchone()
+        return row is not None
+
+    def count(self, user_id):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM wishlist_games WHERE user_id = ?",
+                                           (str(user_id),)).fetchone()[0]
+
+
+# Wishlist held in memory by CachedWishlistStore with the changes not yet written back, in order
+class CachedWishlist:
+    __slots__ = ("games", "pending")
+
+    def __init__(self, games):
+        self.games = games
+        self.pending = []
+
+    @property
+    def dirty(self):
+        return bool(self.pending)
+
+
+# Write-back LRU cache in front of a wishlist store. Every operation holds the lock of its user, so concurrent
+# callbacks of one user are applied one after the other. The changes are kept as the store operations that
+# make them and replayed together after a short delay, so a one-game change stays a one-row write
+class CachedWishlistStore:
+    def __init__(self, store, max_entries=MAX_CACHED_WISHLISTS, flush_interval=WISHLIST_FLUSH_INTERVAL):
+        self.store = store
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.disk_reads = 0
+        self.reads_avoided = 0
+        self.writes = 0
+        self._entries = OrderedDict()
+        self._user_locks = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    # Hold the lock of a user for the duration of a with block. The lock of an evicted user is dropped, a thread
+    # that was waiting on it takes the user's new lock instead
+    @contextmanager
+    def _locked(self, key):
+        while True:
+            with self._lock:
+                lock = self._user_locks.get(key)
+                if lock is None:
+                    lock = self._user_locks[key] = threading.RLock()
+            lock.acquire()
+            with self._lock:
+                current = self._user_locks.get(key)
+            if current is lock:
+                break
+            lock.release()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    # Cached wishlist of a user, read from the store on a miss, the caller holds the user's lock
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.reads_avoided += 1
+                return entry
+        entry = CachedWishlist(self.store.read(key))
+        with self._lock:
+            self.disk_reads += 1
+            self._entries[key] = entry
+            victims = self._take_victims(key)
+        for victim_key, victim, lock in victims:
+            try:
+                if victim.dirty:
+                    self._write(victim_key, victim)
+            finally:
+                # Dropped only once the changes are written, so that the next load reads them back
+                with self._lock:
+                    if self._user_locks.get(victim_key) is lock:
+                        del self._user_locks[victim_key]
+                lock.release()
+        return entry
+
+    # Least recently used entries over the limit whose users are idle, locked and removed from the cache.
+    # Users busy in another thread are skipped rather than waited for, so that two loads cannot deadlock
+    def _take_victims(self, current):
+        victims = []
+        excess = len(self._entries) - self.max_entries
+        for key in list(self._entries):
+            if excess <= 0:
+                break
+            lock = self._user_locks.get(key)
+            if key == current or lock is None or not lock.acquire(blocking=False):
+                continue
+            victims.append((key, self._entries.pop(key), lock))
+            excess -= 1
+        return victims
+
+    # Replay the pending changes of a wishlist on the store, the caller holds the user's lock
+    def _write(self, key, entry):
+        for operation, argument in entry.pending:
+            if operation == "replace":
+                self.store.replace(key, argument)
+            elif operation == "extend":
+                self.store.extend(key, argument)
+            else:
+                self.store.remove_by_name(key, argument)
+        entry.pending = []
+        with self._lock:
+            self.writes += 1
+
+    # Record a change of a wishlist and make sure a flush is scheduled. A replace supersedes the changes before
+    # it and consecutive extends are written as one
+    def _changed(self, entry, operation, argument):
+        if operation == "replace":
+            entry.pending = [(operation, argument)]
+        elif operation == "extend" and entry.pending and entry.pending[-1][0] == "extend":
+            entry.pending[-1][1].extend(argument)
+        else:
+            entry.pending.append((operation, argument))
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    # Write every changed wishlist to the store
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            keys = [key for key, entry in self._entries.items() if entry.dirty]
+        for key in keys:
+            with self._locked(key):
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is not None and entry.dirty:
+                    self._write(key, entry)
+
+    def read(self, user_id):
+        key = str(user_id)
+        with self._locked(key):
+            return list(self._load(key).games)
+
+    def replace(self, user_id, wishlist):
+        key = str(user_id)
+        with self._locked(key):
+            entry = self._load(key)
+            entry.games = list(wishlist)
+            self._changed(entry, "replace", list(wishlist))
+
+    def extend(self, user_id, games):
+        key = str(user_id)
+        with self._locked(key):
+            entry = self._load(key)
+            keys = set(wishlist_key(game) for game in entry.games)
+            added = []
+            for game in games:
+                game_key = wishlist_key(game)
+                if game_key is None or game_key not in keys:
+                    entry.games.append(game)
+                    keys.add(game_key)
+                    added.append(game)
+            if added:
+                self._changed(entry, "extend", added)
+            return len(added)
+
+    def add(self, user_id, game):
+        return self.extend(user_id, [game]) == 1
+
+    def remove_by_name(self, user_id, game_name):
+        key = str(user_id)
+        with self._locked(key):
+            entry = self._load(key)
+            kept = [game for game in entry.games if game['Name'] != game_name]
+            removed = len(entry.games) - len(kept)
+            if removed:
+                entry.games = kept
+                self._changed(entry, "remove", game_name)
+            return removed
+
+    def contains_name(self, user_id, game_name):
+        key = str(user_id)
+        with self._locked(key):
+            return any(game['Name'] == game_name for game in self._load(key).games)
+
+    def count(self, user_id):
+        key = str(user_id)
+        with self._locked(key):
+            return len(self._load(key).games)
+
+    # Disk reads done and avoided, write-backs and current size of the cache
+    def stats(self):
+        with self._lock:
+            return {
+                "disk_reads": self.disk_reads,
+                "reads_avoided": self.reads_avoided,
+                "writes": self.writes,
+                "entries": len(self._entries),
+                "dirty": sum(1 for entry in self._entries.values() if entry.dirty),
+            }
+
+
+# Store for the configured backend
+def open_wishlist_store(backend=WISHLIST_BACKEND):
+    if backend == "json":
+        return JsonWishlistStore()
+    if backend == "sqlite":
+        return SqliteWishlistStore()
+    raise ValueError(f"Unknown wishlist backend: {backend}")
+
+
+# Import the per-user JSON wishlist files into a store and move them out of the way, returns the number of users
+def migrate_json_wishlists(store, directory=WISHLIST_DIRECTORY, migrated_directory=MIGRATED_DIRECTORY):
+    if not os.path.isdir(directory):
+        return 0
+    migrated = 0
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        file_path = os.path.join(directory, name)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                wishlist = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading wishlist file {file_path}: {e}")
+            continue
+        if not isinstance(wishlist, list):
+            print(f"Skipping wishlist file {file_path}: not a list of games")
+            continue
+        store.extend(name[:-len(".json")], [game for game in wishlist if isinstance(game, dict)])
+        os.makedirs(migrated_directory, exist_ok=True)
+        shutil.move(file_path, os.path.join(migrated_directory, name))
+        migrated += 1
+    if migrated:
+        print(f"Migrated the wishlists of {migrated} users.")
+    return migrated
+
+
+# Wishlist store shared by all handlers in the process, changes still in memory are written at shutdown
+WISHLIST_STORE = CachedWishlistStore(open_wishlist_store())
+atexit.register(WISHLIST_STORE.flush)
+
+
+if __name__ == "__main__":
+    # One-shot migration of the JSON wishlists, run from the Project directory
+    target = SqliteWishlistStore(sys.argv[1] if len(sys.argv) > 1 else WISHLIST_DB_PATH)
+    print(f"{migrate_json_wishlists(target)} wishlists migrated to {target.path}.")
@@ -0,0 +1,82 @@
+from datetime import date
+from operator import attrgetter
+
+import numpy as np
+
+# Sort keys of a wishlist entry, each is a number so that entries compare without parsing anything
+SORT_KEYS = ("release", "total_reviews", "ratio", "price")
+
+
+# Numeric price of a catalog price string, 0.0 for free games, None when it is not a dollar price
+def parse_price(price):
+    if isinstance(price, (int, float)):
+        return float(price)
+    if not isinstance(price, str):
+        return None
+    if price.strip().lower() == "free":
+        return 0.0
+    if price.startswith("$"):
+        try:
+            return float(price[1:].replace(",", ""))
+        except ValueError:
+            return None
+    return None
+
+
+# Wishlist game joined with its catalog record, details is None when the game is not in the catalog
+class WishlistEntry:
+    __slots__ = ("game", "details", "release", "total_reviews", "ratio", "price")
+
+    def __init__(self, game, details, release, total_reviews, ratio, price):
+        self.game = game
+        self.details = details
+        self.release = release
+        self.total_reviews = total_reviews
+        self.ratio = ratio
+        self.price = price
+
+    # Free games have a price of 0.0, games without a dollar price are not free
+    @property
+    def is_free(self):
+        return self.price == 0.0
+
+    # Games announced as "Coming soon" or released after today
+    @property
+    def is_upcoming(self):
+        release_date = (self.details or self.game).get('ReleaseDate') or ""
+        return release_date.lower() == "coming soon" or self.release > date.today().toordinal()
+
+
+# Join a wishlist against the catalog in one pass: one ID lookup per game and the sort keys gathered from the
+# catalog columns, games missing from the catalog keep zero keys and the price stored in the wishlist
+def join_wishlist(wishlist, catalog):
+    positions = catalog.get_positions(game.get('ID') for game in wishlist)
+    has_id = np.array([bool(game.get('ID')) for game in wishlist], dtype=bool)
+    positions[~has_id] = -1
+    found = positions >= 0
+    release = np.zeros(len(wishlist), dtype=np.int64)
+    total = np.zeros(len(wishlist), dtype=np.int64)
+    ratio = np.zeros(len(wishlist))
+    release[found] = catalog.columns.release[positions[found]]
+    total[found] = catalog.columns.total[positions[found]]
+    ratio[found] = catalog.columns.ratio[positions[found]]
+
+    entries = []
+    for game, position, release_key, total_key, ratio_key in zip(wishlist, positions.tolist(), release.tolist(),
+                                                                  total.tolist(), ratio.tolist()):
+        details = catalog.records[position] if position >= 0 else None
+        price = parse_price((details or game).get('Price'))
+        entries.append(WishlistEntry(game, details, release_key, total_key, ratio_key, price))
+    return entries
+
+
+# Entries sorted by one of the sort keys, descending by default, equal keys keep their wishlist order
+def sort_entries(entries, key, descending=True):
+    if key not in SORT_KEYS:
+        raise ValueError(f"Unknown wishlist sort key: {key}")
+    if key == "price":
+        # Games without a dollar price go last whichever way the list is sorted
+        priced = [entry for entry in entries if entry.price is not None]
+        unpriced = [entry for entry in entries if entry.price is None]
+        return sorted(priced, key=attrgetter(key), reverse=descending) + unpriced
+    return sorted(entries, key=attrgetter(key), reverse=descending)
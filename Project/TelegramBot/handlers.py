@@ -1,27 +1,35 @@
-import os
-import json
-import asyncio
 import subprocess
 import sys
+import threading
+import time
 from collections import Counter
-from datetime import datetime
 import io
 import matplotlib.pyplot as plt
 
-import requests
 from telebot import TeleBot, types
 
-from SteamAPI.SteamAPI import process_game, create_session_with_retries
+from SteamAPI.SteamAPI import fetch_game, create_session_with_retries
 from TelegramBot import config
 from config import TgID, SteamKey
+from price_lookup import get_steam_prices
+from query_cache import QUERY_CACHE
+from search_pages import SEARCH_PAGES, SEARCH_RESULTS_LIMIT
+from wishlist_store import WISHLIST_STORE
 from data_manager import (
-    find_game_by_exact_id, read_database, find_games_by_tag, format_game_list, find_games_by_name, read_txt_file, read_yaml_file, save_wishlist,
+    read_database, find_games_by_tag, format_game_list, find_games_by_name, save_wishlist,
     read_wishlist, add_game_to_wishlist, remove_game_from_wishlist, find_game_by_exact_name,
-    check_wishlist, get_wishlist_count, generate_wishlist_file_txt, generate_wishlist_file_json,
-    generate_wishlist_file_yaml, read_json_wishlist, get_wishlist_path, read_wishlist, preload_database,
-    sort_wishlist_by_date, update_wishlist, sort_wishlist_by_reviews
+    check_wishlist, get_wishlist_count, export_wishlist, upsert_game,
+    sort_wishlist_by_date, update_wishlist, sort_wishlist_by_reviews, is_database_ready, enrich_wishlist,
+    iter_txt_file, iter_yaml_file
 )
 
+# Games shown per page of name and tag search results
+NAME_PAGE_SIZE = 10
+TAG_PAGE_SIZE = 20
+
+# Seconds between edits of the progress message of a wishlist import
+IMPORT_PROGRESS_INTERVAL = 2
+
 exchange_rates = {
     'RUB': 0.013,
     'UAH': 0.027,
@@ -33,11 +41,37 @@ exchange_rates = {
 }
 
 def setup_handlers(bot):
+    # Game database for a handler, tells the user to retry when the catalog is still loading or missing
+    def database_or_notice(chat_id):
+        database = read_database()
+        if database is None:
+            if is_database_ready():
+                bot.send_message(chat_id, "The game database is not available right now.")
+            else:
+                bot.send_message(chat_id, "The game database is warming up, please try again in a few seconds.")
+        return database
+
     # Handler for the /start command, displays the main menu
     @bot.message_handler(commands=['start'])
     def send_welcome(message):
         show_main_menu(message)
 
+    # Handler for the /cache_stats command, shows the search and wishlist cache counters to the authorized user
+    @bot.message_handler(commands=['cache_stats'])
+    def send_cache_stats(message):
+        if message.chat.id != TgID:
+            bot.send_message(message.chat.id, "You are not authorized to view cache statistics.")
+            return
+        stats = QUERY_CACHE.stats()
+        bot.send_message(message.chat.id,
+                         f"Search cache: {stats['hits']} hits, {stats['misses']} misses "
+                         f"(hit rate {stats['hit_rate']:.1%}), {stats['evictions']} evictions, "
+                         f"{stats['entries']} entries.")
+        stats = WISHLIST_STORE.stats()
+        bot.send_message(message.chat.id,
+                         f"Wishlist cache: {stats['disk_reads']} disk reads, {stats['reads_avoided']} reads avoided, "
+                         f"{stats['writes']} writes, {stats['entries']} entries ({stats['dirty']} unsaved).")
+
     # Handler for the "Back" button, shows the main menu
     @bot.message_handler(func=lambda message: message.text == "Back")
     def handle_back(message):
@@ -138,7 +172,9 @@ def setup_handlers(bot):
     @bot.message_handler(func=lambda message: message.text == "Sort by date")
     def sort_wishlist_by_date_handler(message):
         user_id = message.chat.id
-        database = read_database()
+        database = database_or_notice(message.chat.id)
+        if database is None:
+            return
 
         wishlist = read_wishlist(user_id)
 
@@ -161,7 +197,9 @@ def setup_handlers(bot):
     @bot.message_handler(func=lambda message: message.text == "Sort by reviews")
     def sort_wishlist_by_reviews_handler(message):
         user_id = message.from_user.id
-        database = read_database()
+        database = database_or_notice(message.chat.id)
+        if database is None:
+            return
 
         wishlist = read_wishlist(user_id)
 
@@ -206,14 +244,15 @@ def setup_handlers(bot):
     @bot.message_handler(func=lambda message: message.text == "Count Tags")
     def handle_tag_count(message):
         user_id = message.chat.id
+        database = database_or_notice(user_id)
+        if database is None:
+            return
         wishlist = read_wishlist(user_id)
         tag_counter = Counter()
         tag_to_games = {}
-        game_ids = [game['ID'] for game in wishlist]
-        for game_id in game_ids:
-            games = find_game_by_exact_id(game_id, read_database())
-            if games:
-                game = games[0]
+        for entry in enrich_wishlist(wishlist, database):
+            game = entry.details
+            if game:
                 tags = game.get('TopTags', [])
                 for tag in tags:
                     if tag not in tag_to_games:
@@ -266,16 +305,12 @@ def setup_handlers(bot):
     def handle_price_region(call):
         region_code = call.data.split('_')[1]
         user_id = call.message.chat.id
+        database = database_or_notice(user_id)
+        if database is None:
+            return
         wishlist = read_wishlist(user_id)
 
-        game_ids = [game['ID'] for game in wishlist]
-
-        game_info = []
-        for game_id in game_ids:
-            games = find_game_by_exact_id(game_id, read_database())
-            if games:
-                game = games[0]
-                game_info.append((game['ID'], game['Name'], game['Price'], game.get('ReleaseDate')))
+        game_info = [entry for entry in enrich_wishlist(wishlist, database) if entry.details is not None]
         total_price, currency, available_games, unavailable_games, free_games, upcoming_games = calculate_regional_prices(
             game_info, region_code)
         us_total_price = calculate_us_prices(game_info, unavailable_games)
@@ -357,16 +392,23 @@ def setup_handlers(bot):
         free_games = []
         upcoming_games = []
 
-        for game_id, game_name, game_price, release_date in game_info:
-            if game_price.lower() == "free":
+        priced_games = []
+        for entry in game_info:
+            game_name = entry.details['Name']
+            if entry.is_free:
                 free_games.append(game_name)
                 continue
 
-            if is_upcoming_game(release_date):
+            if entry.is_upcoming:
                 upcoming_games.append(game_name)
                 continue
 
-            price_info, cur, available = get_steam_price(game_id, region)
+            priced_games.append((entry.details['ID'], game_name))
+
+        # Prices of the whole wishlist are fetched in a few batched requests
+        prices = get_steam_prices([game_id for game_id, _ in priced_games], region)
+        for game_id, game_name in priced_games:
+            price_info, cur, available = prices[game_id]
             if available:
                 total_price += price_info
                 currency = cur
@@ -376,42 +418,15 @@ def setup_handlers(bot):
 
         return total_price, currency, available_games, unavailable_games, free_games, upcoming_games
 
-    # Function to check if the game is upcoming based on the release date
-    def is_upcoming_game(release_date):
-        try:
-            if release_date.lower() == "coming soon":
-                return True
-            release_date = datetime.strptime(release_date, "%b %d, %Y")
-            return release_date > datetime.now()
-        except ValueError:
-            return False
-
-    # Function to get the price of the game from Steam API based on region
-    def get_steam_price(game_id, region):
-        api_url = f"https://store.steampowered.com/api/appdetails?appids={game_id}&cc={region}&filters=price_overview"
-        response = requests.get(api_url)
-        data = response.json()
-
-        try:
-            if isinstance(data, dict) and data[str(game_id)]['success']:
-                price_data = data[str(game_id)]['data']['price_overview']
-                price = price_data['final'] / 100.0
-                currency = price_data['currency']
-                return price, currency, True
-            return 0, "USD", False
-        except (KeyError, TypeError):
-            return 0, "USD", False
-
     # Function to calculate the total price of US games
     def calculate_us_prices(game_info, unavailable_games):
         total_price = 0
-        for game_id, game_name, game_price, release_date in game_info:
-            if game_name in unavailable_games:
+        for entry in game_info:
+            if entry.details['Name'] in unavailable_games:
                 continue
-            if game_price.lower() == "free" or is_upcoming_game(release_date):
+            if entry.is_free or entry.is_upcoming:
                 continue
-            price_value = float(game_price.replace("$", "")) if game_price.startswith("$") else 0
-            total_price += price_value
+            total_price += entry.price or 0
         return total_price
 
     # Function to find a game by exact name in the wishlist
@@ -428,7 +443,10 @@ def setup_handlers(bot):
         game_name = call.data.split('_', 1)[1]
         game_data = find_game_by_exact_name_wish(game_name, call.message.chat.id)
         if game_data:
-            game_info = find_game_by_exact_name(game_name, read_database())
+            database = database_or_notice(call.message.chat.id)
+            if database is None:
+                return
+            game_info = find_game_by_exact_name(game_name, database)
             if game_info:
                 game_info = game_info[0][0]
                 image_url = game_info['ImageURL']
@@ -499,7 +517,9 @@ def setup_handlers(bot):
         print("Processing list callback...")
         game_id = call.data.split('_', 1)[1]
         print("Game ID extracted:", game_id)
-        database = read_database()
+        database = database_or_notice(call.message.chat.id)
+        if database is None:
+            return
         print("Database loaded.")
 
         game = database.get(game_id)
@@ -577,7 +597,9 @@ def setup_handlers(bot):
     @bot.callback_query_handler(func=lambda call: call.data.startswith('languages_'))
     def show_available_languages(call):
         game_id = call.data.split('_', 1)[1]
-        database = read_database()
+        database = database_or_notice(call.message.chat.id)
+        if database is None:
+            return
         game = database.get(game_id)
 
         if game:
@@ -594,37 +616,78 @@ def setup_handlers(bot):
         else:
             bot.send_message(call.message.chat.id, "Game details not found.")
 
-    # Function to search games by name
-    def search_game_by_name(message):
-        search_msg = bot.send_message(message.chat.id, f"Searching for games with name '{message.text}'...")
-        games = find_games_by_name(message.text, read_database())[:10]
+    # Inline keyboard with one page of search results and the buttons to the neighbouring pages
+    def search_page_markup(games, token, offset, total, page_size):
         markup = types.InlineKeyboardMarkup()
         for game_id, (game_data, _) in games:
             callback_data = f'list_{game_id}'
             markup.add(types.InlineKeyboardButton(game_data["Name"], callback_data=callback_data))
-        if games:
-            bot.edit_message_text("Select a game:", message.chat.id, search_msg.message_id, reply_markup=markup)
-        else:
-            bot.edit_message_text("No games found with that name.", message.chat.id, search_msg.message_id)
+        buttons = []
+        if offset > 0:
+            buttons.append(types.InlineKeyboardButton(
+                "Previous page", callback_data=f"page_{token}_{max(offset - page_size, 0)}"))
+        if offset + page_size < total:
+            buttons.append(types.InlineKeyboardButton("Next page", callback_data=f"page_{token}_{offset + page_size}"))
+        if buttons:
+            markup.row(*buttons)
+        return markup
+
+    # Prompt above a page of search results, with the position of the page when there are several
+    def search_page_text(offset, count, total):
+        if count == total:
+            return "Select a game:"
+        return f"Select a game ({offset + 1}-{offset + count} of {total}):"
+
+    # Show the first page of ranked search results, the rest is kept for the "Next page" button
+    def show_search_results(message, search_msg, games, page_size, not_found_text):
+        if not games:
+            bot.edit_message_text(not_found_text, message.chat.id, search_msg.message_id)
+            return
+        token = SEARCH_PAGES.store(games, page_size)
+        page = games[:page_size]
+        bot.edit_message_text(search_page_text(0, len(page), len(games)), message.chat.id, search_msg.message_id,
+                              reply_markup=search_page_markup(page, token, 0, len(games), page_size))
+
+    # Function to search games by name
+    def search_game_by_name(message):
+        database = database_or_notice(message.chat.id)
+        if database is None:
+            return
+        search_msg = bot.send_message(message.chat.id, f"Searching for games with name '{message.text}'...")
+        games = find_games_by_name(message.text, database, limit=SEARCH_RESULTS_LIMIT)
+        show_search_results(message, search_msg, games, NAME_PAGE_SIZE, "No games found with that name.")
 
     # Function to search games by tag
     def search_game_by_tag(message):
+        database = database_or_notice(message.chat.id)
+        if database is None:
+            return
         search_msg = bot.send_message(message.chat.id, f"Searching for games by tag '{message.text}'...")
-        games = find_games_by_tag(message.text, read_database())[:20]
-        markup = types.InlineKeyboardMarkup()
-        for game_id, (game_data, _) in games:
-            callback_data = f'list_{game_id}'
-            markup.add(types.InlineKeyboardButton(game_data["Name"], callback_data=callback_data))
-        if games:
-            bot.edit_message_text("Select a game:", message.chat.id, search_msg.message_id, reply_markup=markup)
-        else:
-            bot.edit_message_text("No games found with that tag.", message.chat.id, search_msg.message_id)
+        games = find_games_by_tag(message.text, database, limit=SEARCH_RESULTS_LIMIT)
+        show_search_results(message, search_msg, games, TAG_PAGE_SIZE, "No games found with that tag.")
+
+    # Callback handler for the search result pages, served from the stored results without searching again
+    @bot.callback_query_handler(func=lambda call: call.data.startswith('page_'))
+    def show_search_page(call):
+        _, token, offset = call.data.split('_', 2)
+        offset = int(offset)
+        page = SEARCH_PAGES.page(token, offset)
+        if page is None:
+            bot.answer_callback_query(call.id, "This search has expired, please search again.")
+            return
+        games, total, page_size = page
+        bot.edit_message_text(search_page_text(offset, len(games), total), call.message.chat.id,
+                              call.message.message_id,
+                              reply_markup=search_page_markup(games, token, offset, total, page_size))
+        bot.answer_callback_query(call.id)
 
     # Callback handler to add a game to the wishlist
     @bot.callback_query_handler(func=lambda call: call.data.startswith('add_'))
     def add_to_wishlist(call):
         game_name = call.data.split('_', 1)[1]
-        database = read_database()
+        database = database_or_notice(call.message.chat.id)
+        if database is None:
+            return
         games = find_game_by_exact_name(game_name, database)
 
         if games:
@@ -667,30 +730,26 @@ def setup_handlers(bot):
         itembtn_txt = types.KeyboardButton('Download as TXT')
         itembtn_json = types.KeyboardButton('Download as JSON')
         itembtn_yaml = types.KeyboardButton('Download as YAML')
+        itembtn_csv = types.KeyboardButton('Download as CSV')
+        itembtn_jsonl = types.KeyboardButton('Download as JSONL')
         itembtn_back = types.KeyboardButton('Back')
-        markup.add(itembtn_txt, itembtn_json, itembtn_yaml, itembtn_back)
+        markup.add(itembtn_txt, itembtn_json, itembtn_yaml, itembtn_csv, itembtn_jsonl, itembtn_back)
 
         bot.send_message(message.chat.id, "Choose a format to download your wishlist:", reply_markup=markup)
 
-    # Handler for format selection, downloads the wishlist in the chosen format
+    # Handler for format selection, sends the wishlist in the chosen format straight from memory
     @bot.message_handler(func=lambda message: message.text.startswith("Download as"))
     def download_wishlist(message):
         user_id = message.chat.id
         format_choice = message.text.split()[-1].lower()
-        if format_choice == 'txt':
-            filename = generate_wishlist_file_txt(user_id)
-        elif format_choice == 'json':
-            filename = generate_wishlist_file_json(user_id)
-        elif format_choice == 'yaml':
-            filename = generate_wishlist_file_yaml(user_id)
-        else:
+        export = export_wishlist(user_id, format_choice)
+        if export is None:
             bot.send_message(message.chat.id, "Unknown format. Please choose again.")
             return
 
-        with open(filename, 'rb') as file:
-            bot.send_document(message.chat.id, file)
-
-        os.remove(filename)
+        file, filename = export
+        with file:
+            bot.send_document(message.chat.id, file, visible_file_name=filename)
 
     # Handler for "Import Wishlist" button, prompts user to send the wishlist file
     @bot.message_handler(func=lambda message: message.text == "Import Wishlist")
@@ -710,43 +769,74 @@ def setup_handlers(bot):
             file_extension = message.document.file_name.split('.')[-1].lower()
 
             if file_extension == 'txt':
-                imported_data = read_txt_file(downloaded_file)
+                imported_data = iter_txt_file(downloaded_file)
             elif file_extension == 'yaml' or file_extension == 'yml':
-                imported_data = read_yaml_file(downloaded_file)
+                imported_data = iter_yaml_file(downloaded_file)
             else:
                 bot.send_message(user_id, "Unsupported file format. Please upload a txt or yaml file.")
                 return
 
-            update_wishlist(user_id, imported_data)
+            database = database_or_notice(user_id)
+            if database is None:
+                return
+            status = bot.send_message(user_id, "Importing wishlist...")
+            counts = update_wishlist(user_id, imported_data, database,
+                                     progress=import_progress_reporter(user_id, status.message_id))
 
-            bot.send_message(user_id, "Wishlist imported and updated successfully.")
+            edit_import_status(user_id, status.message_id,
+                               f"Wishlist imported and updated successfully.\n{import_summary(counts)}")
 
         except Exception as e:
             bot.send_message(user_id, f"An error occurred: {str(e)}")
             print(f"An error occurred: {str(e)}")
 
-    # Function to update game information using Steam API
-    def update_game_info(appid):
-        api_key = config.SteamKey
-        session = create_session_with_retries()
-        process_game(appid, session, api_key)
+    # Text of the import counters shown in the progress message
+    def import_summary(counts):
+        return (f"Processed: {counts['processed']}, added: {counts['added']}, "
+                f"already in wishlist: {counts['duplicates']}, not found: {counts['not_found']}, "
+                f"invalid: {counts['invalid']}")
 
-        with open('detailed_steam_games.json', 'r', encoding='utf-8') as new_data_file:
-            new_data = json.load(new_data_file)
+    # Edit the import progress message, a failed edit must not stop the import
+    def edit_import_status(chat_id, message_id, text):
+        try:
+            bot.edit_message_text(text, chat_id, message_id)
+        except Exception as e:
+            print(f"Import progress could not be shown: {e}")
 
-        transformed_file_path = 'SteamAPI/JSON/detailed_games_transformed.json'
-        with open(transformed_file_path, 'r', encoding='utf-8') as transformed_data_file:
-            transformed_data = json.load(transformed_data_file)
+    # Progress callback of an import, edits the progress message at most once per IMPORT_PROGRESS_INTERVAL
+    def import_progress_reporter(chat_id, message_id):
+        last_edit = [time.monotonic()]
 
-        for game in new_data:
-            game_id = game['ID']
-            transformed_data[str(game_id)] = game
+        def report(counts):
+            now = time.monotonic()
+            if now - last_edit[0] >= IMPORT_PROGRESS_INTERVAL:
+                last_edit[0] = now
+                edit_import_status(chat_id, message_id, f"Importing wishlist...\n{import_summary(counts)}")
 
-        with open(transformed_file_path, 'w', encoding='utf-8') as transformed_data_file:
-            json.dump(transformed_data, transformed_data_file, indent=4)
+        return report
 
-        os.remove('detailed_steam_games.json')
-        asyncio.run(preload_database())
+    # Function to update game information using Steam API, the refreshed game is upserted into the catalog.
+    # The record is built in memory, the crawl stores are shared with other updates and a running crawl
+    def update_game_info(appid):
+        api_key = config.SteamKey
+        session = create_session_with_retries()
+        new_game = fetch_game(appid, session, api_key)
+        if not new_game:
+            return False
+        upsert_game(new_game)
+        return True
+
+    # Update a game off the polling thread and report the outcome to the chat
+    def run_game_update(game_id, chat_id):
+        try:
+            updated = update_game_info(game_id)
+        except Exception as e:
+            print(f"Error updating game {game_id}: {e}")
+            updated = False
+        if updated:
+            bot.send_message(chat_id, f"Game information for ID {game_id} has been updated.")
+        else:
+            bot.send_message(chat_id, f"Game information for ID {game_id} could not be updated.")
 
     # Callback handler to update game information from Steam API
     @bot.callback_query_handler(func=lambda call: call.data.startswith('update_'))
@@ -754,7 +844,7 @@ def setup_handlers(bot):
         game_id = call.data.split('_', 1)[1]
         user_id = call.message.chat.id
         if user_id == TgID:
-            update_game_info(game_id)
-            bot.answer_callback_query(call.id, f"Game information for ID {game_id} has been updated.")
+            bot.answer_callback_query(call.id, f"Updating game information for ID {game_id}...")
+            threading.Thread(target=run_game_update, args=(game_id, user_id), daemon=True).start()
         else:
             bot.answer_callback_query(call.id, "You are not authorized to update game information.")
\ No newline at end of file
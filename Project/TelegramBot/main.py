@@ -1,10 +1,30 @@
+import signal
+
 import telebot
 import config
 import handlers
+from data_manager import start_database_preload
+from wishlist_store import WISHLIST_STORE
 
 bot = telebot.TeleBot(config.TOKEN)
 
 handlers.setup_handlers(bot)
 
+
+# Stop polling and write the cached wishlist changes on SIGTERM (docker stop) and SIGINT. atexit does not run when
+# the process is killed by a signal, and polling may only return after the current long poll, so the wishlists are
+# written right away
+def handle_shutdown(signum, frame):
+    print(f"Received {signal.Signals(signum).name}, stopping the bot.")
+    bot.stop_polling()
+    WISHLIST_STORE.flush()
+
+
 if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+    # The catalog loads in the background, handlers that need it answer "warming up" until it is ready
+    start_database_preload()
     bot.infinity_polling()
+    # Changes made by requests that finished while polling stopped
+    WISHLIST_STORE.flush()
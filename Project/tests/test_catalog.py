@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SteamAPI"))
+
+from catalog_merge import CatalogMerger
+from catalog_snapshot import load_snapshot
+from game_catalog import GameCatalog
+
+
+def game(game_id, name, reviews=0, tags=("Indie",)):
+    return {"ID": game_id, "Name": name, "Price": "$1.00", "PositiveReviews": reviews, "NegativeReviews": 0,
+            "DayPeak": 0, "TopTags": list(tags), "ReleaseDate": "Jan 1, 2020"}
+
+
+def invalid_game(game_id):
+    return {"ID": game_id, "Name": "Invalid Game"}
+
+
+class CatalogMergerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.merger = CatalogMerger(**{argument: self.path(name) for argument, name in (
+            ("valid_path", "valid.json"), ("invalid_path", "invalid.json"), ("transformed_path", "transformed.json"),
+            ("index_path", "index.tsv"), ("delta_directory", "delta"), ("snapshot_path", "snapshot.bin"),
+            ("patch_directory", "patches"), ("lock_path", "catalog.lock"))})
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, games):
+        with open(self.path(name), 'w', encoding='utf-8') as file:
+            json.dump(games, file)
+
+    def read(self, name):
+        with open(self.path(name), 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def names(self, name):
+        return {entry["ID"]: entry["Name"] for entry in self.read(name)}
+
+    def test_crawled_games_win_over_patches_and_failed_refetches_keep_games(self):
+        self.write("valid.json", [game(1, "One"), game(2, "Two")])
+        self.write("invalid.json", [invalid_game(3)])
+        self.merger.patches.append(game(1, "One patched"))
+        self.merger.patches.append(game(3, "Three patched"))
+        self.merger.valid_delta.append(game(1, "One crawled"))
+        self.merger.invalid_delta.append(invalid_game(2))
+        self.merger.invalid_delta.append(invalid_game(4))
+
+        self.assertTrue(self.merger.finalize())
+        self.assertEqual(self.names("valid.json"), {1: "One crawled", 2: "Two", 3: "Three patched"})
+        self.assertEqual(self.names("invalid.json"), {4: "Invalid Game"})
+        self.assertEqual(sorted(self.read("transformed.json")), ["1", "2", "3"])
+        self.assertEqual(self.merger.patches.segments(), [])
+        self.assertEqual(self.merger.valid_delta.segments(), [])
+        self.assertEqual(self.merger.invalid_delta.segments(), [])
+        snapshot = load_snapshot(self.path("snapshot.bin"), self.path("transformed.json"))
+        self.assertEqual(snapshot.get_by_id(3)["Name"], "Three patched")
+
+    def test_game_that_stopped_resolving_moves_to_the_invalid_file(self):
+        self.write("valid.json", [game(1, "One")])
+        self.write("invalid.json", [])
+        self.merger.invalid_delta.append({"ID": 1, "Name": "Removed from the store"})
+        self.assertTrue(self.merger.finalize())
+        self.assertEqual(self.names("valid.json"), {})
+        self.assertEqual(self.names("invalid.json"), {1: "Removed from the store"})
+
+    def test_fold_patches(self):
+        self.merger.patches.append(game(5, "Five"))
+        # Without the crawler's catalog file the patches stay in the log
+        self.assertFalse(self.merger.fold_patches())
+        self.assertEqual(len(self.merger.patches.segments()), 1)
+
+        self.write("valid.json", [game(1, "One")])
+        self.assertTrue(self.merger.fold_patches())
+        self.assertEqual(self.names("valid.json"), {1: "One", 5: "Five"})
+        self.assertEqual(self.merger.patches.segments(), [])
+        self.assertFalse(self.merger.fold_patches())
+
+    def test_broken_catalog_file_keeps_the_segments(self):
+        with open(self.path("valid.json"), 'w', encoding='utf-8') as file:
+            file.write("[{")
+        self.merger.patches.append(game(5, "Five"))
+        self.merger.valid_delta.append(game(6, "Six"))
+        self.assertFalse(self.merger.finalize())
+        self.assertEqual(len(self.merger.patches.segments()), 1)
+
+
+class GameCatalogUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.games = {str(game_id): game(game_id, name, reviews, tags) for game_id, name, reviews, tags in (
+            (1, "Dark Souls", 500, ("RPG", "Souls-like")),
+            (2, "Dark Souls", 50, ("RPG",)),
+            (3, "Stardew Valley", 300, ("Farming", "Indie")),
+            (4, "Portal", 400, ("Puzzle",)),
+            (5, "Portal 2", 450, ("Puzzle", "Co-op")),
+        )}
+        self.catalog = GameCatalog(self.games)
+
+    # The same queries against the upserted catalog and a catalog built from scratch
+    def assert_same_as_rebuilt(self, catalog):
+        rebuilt = GameCatalog({game_id: record.to_dict() if hasattr(record, "to_dict") else record
+                               for game_id, record in catalog.games.items()})
+        for query in ("dark souls", "portal", "stardew valey", "souls", "half life"):
+            self.assertEqual([result[0] for result in catalog.search_by_name(query)],
+                             [result[0] for result in rebuilt.search_by_name(query)], query)
+        for tag in ("rpg", "puzzle", "indie", "co-op", "farming"):
+            self.assertEqual([result[0] for result in catalog.search_by_tag(tag)],
+                             [result[0] for result in rebuilt.search_by_tag(tag)], tag)
+        for name in ("dark souls", "portal", "portal 2", "stardew valley", "half-life"):
+            found, expected = catalog.get_by_name(name), rebuilt.get_by_name(name)
+            self.assertEqual(found and found["ID"], expected and expected["ID"], name)
+
+    def test_upsert_matches_a_rebuilt_catalog(self):
+        catalog = self.catalog.upsert([game(6, "Half-Life", 1000, ("Shooter", "Puzzle")),
+                                       game(4, "Portal", 10, ("Puzzle",))])
+        self.assertEqual(set(catalog.patched), {"6", "4"})
+        self.assert_same_as_rebuilt(catalog)
+        self.assertEqual(catalog.search_by_tag("puzzle")[0][0], "6")
+
+    def test_renamed_game_gives_its_old_name_to_the_next_game(self):
+        catalog = self.catalog.upsert([game(1, "Dark Souls Remastered", 500, ("RPG",))])
+        self.assertEqual(catalog.get_by_name("dark souls")["ID"], 2)
+        self.assertEqual(catalog.get_by_name("Dark Souls Remastered")["ID"], 1)
+        catalog = catalog.upsert([game(2, "Dark Souls II", 50, ("RPG",))])
+        self.assertIsNone(catalog.get_by_name("dark souls"))
+        self.assert_same_as_rebuilt(catalog)
+
+    def test_later_upserts_win_and_the_original_catalog_is_unchanged(self):
+        catalog = self.catalog.upsert([game(3, "Stardew Valley", 1, ()), game(3, "Stardew Valley", 900, ("Indie",))])
+        self.assertEqual(catalog.get_by_id(3)["PositiveReviews"], 900)
+        self.assertEqual(catalog.search_by_tag("indie")[0][0], "3")
+        self.assertEqual(self.catalog.get_by_id(3)["PositiveReviews"], 300)
+        self.assertEqual(self.catalog.patched, {})
+        self.assert_same_as_rebuilt(catalog)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SteamAPI"))
+
+from catalog_snapshot import PREFIX, load_snapshot, write_snapshot
+from game_catalog import GameCatalog
+
+
+def game(game_id, name, reviews, tags):
+    return {"ID": game_id, "Name": name, "Price": "$1.00", "PositiveReviews": reviews, "NegativeReviews": 1,
+            "DayPeak": reviews // 10, "TopTags": list(tags), "ReleaseDate": "Mar 10, 2021", "Extra": [game_id]}
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshot_path = os.path.join(directory.name, "snapshot.bin")
+        self.source_path = os.path.join(directory.name, "transformed.json")
+        games = {str(game_id): game(game_id, f"Game {game_id}", game_id * 7 % 50, ("Indie", f"Tag {game_id % 3}"))
+                 for game_id in range(1, 40)}
+        with open(self.source_path, 'w', encoding='utf-8') as file:
+            json.dump(games, file)
+        self.catalog = GameCatalog(games)
+
+    def load(self):
+        return load_snapshot(self.snapshot_path, self.source_path)
+
+    def test_round_trip(self):
+        catalog = self.catalog.upsert([game(40, "Game 40 Remastered", 900, ("Indie",)),
+                                       game(3, "Game Three", 0, ("Tag 9",))])
+        write_snapshot(catalog, self.snapshot_path, self.source_path)
+        loaded = self.load()
+        self.assertEqual(loaded.game_ids, catalog.game_ids)
+        self.assertEqual(loaded.patched, catalog.patched)
+        self.assertEqual(loaded.get_by_id(3).to_dict(), catalog.get_by_id(3).to_dict())
+        self.assertEqual(loaded.get_by_id(7)["Extra"], [7])
+        self.assertEqual(loaded.get_by_name("game three")["ID"], 3)
+        self.assertEqual(loaded.columns.total.tolist(), catalog.columns.total.tolist())
+        for query in ("game 4", "remastered", "game thre"):
+            self.assertEqual([result[0] for result in loaded.search_by_name(query)],
+                             [result[0] for result in catalog.search_by_name(query)], query)
+        for tag in ("indie", "tag 1", "tag 9"):
+            self.assertEqual([result[0] for result in loaded.search_by_tag(tag)],
+                             [result[0] for result in catalog.search_by_tag(tag)], tag)
+
+    def test_missing_snapshot(self):
+        self.assertIsNone(self.load())
+
+    def test_snapshot_older_than_the_catalog_is_not_loaded(self):
+        write_snapshot(self.catalog, self.snapshot_path, self.source_path)
+        with open(self.source_path, 'a', encoding='utf-8') as file:
+            file.write("\n")
+        self.assertIsNone(self.load())
+
+    def test_damaged_snapshot_is_not_loaded(self):
+        write_snapshot(self.catalog, self.snapshot_path, self.source_path)
+        with open(self.snapshot_path, 'r+b') as file:
+            file.seek(PREFIX.size + 10)
+            byte = file.read(1)
+            file.seek(PREFIX.size + 10)
+            file.write(bytes([byte[0] ^ 0xFF]))
+        self.assertIsNone(self.load())
+
+    def test_truncated_snapshot_is_not_loaded(self):
+        write_snapshot(self.catalog, self.snapshot_path, self.source_path)
+        with open(self.snapshot_path, 'r+b') as file:
+            file.truncate(PREFIX.size - 4)
+        self.assertIsNone(self.load())
+
+
+if __name__ == "__main__":
+    unittest.main()
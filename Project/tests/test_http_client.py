@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SteamAPI"))
+
+import http_client
+import SteamAPI
+from rate_limiter import AIMDController
+
+
+# Local server answering with the scripted statuses in order, then with 200
+class ScriptedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, statuses):
+        super().__init__(("127.0.0.1", 0), ScriptedHandler)
+        self.statuses = list(statuses)
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/api/appdetails"
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b"{}" if status == 200 else b""
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThrottlingTest(unittest.TestCase):
+    def start_server(self, statuses):
+        server = ScriptedServer(statuses)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_429_is_returned_after_one_request(self):
+        server = self.start_server([429, 429, 429, 429])
+        response = http_client.get(server.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(server.requests, 1)
+
+    def test_429_reaches_get_with_backoff(self):
+        server = self.start_server([429])
+        controller = AIMDController(initial=2)
+        before = SteamAPI.TELEMETRY.snapshot()["counters"].get("test_fetch_429", 0)
+        response = SteamAPI.get_with_backoff(controller, server.url, metric="test_fetch")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server.requests, 2)
+        self.assertEqual(controller.throttled, 1)
+        self.assertEqual(SteamAPI.TELEMETRY.snapshot()["counters"]["test_fetch_429"] - before, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
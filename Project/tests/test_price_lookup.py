@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SteamAPI"))
+
+import price_lookup
+from response_cache import ResponseCache
+
+
+# Local store endpoint answering the scripted statuses in order, then the price of every requested app ID.
+# IDs in "missing" are left out of the batched answers and "malformed" makes the batched answers invalid JSON
+class PriceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, statuses=(), retry_after="0", missing=(), malformed=False):
+        super().__init__(("127.0.0.1", 0), PriceHandler)
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.missing = set(missing)
+        self.malformed = malformed
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class PriceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        appids = parse_qs(urlsplit(self.path).query)["appids"][0].split(",")
+        with server.lock:
+            server.requests.append(appids)
+            status = server.statuses.pop(0) if server.statuses else 200
+        if status != 200:
+            body = b""
+        elif len(appids) > 1 and server.malformed:
+            body = b"<html>"
+        else:
+            data = {appid: {"success": True, "data": {"price_overview": {"final": int(appid) * 100, "currency": "USD"}}}
+                    for appid in appids if len(appids) == 1 or appid not in server.missing}
+            body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        if status == 429 and server.retry_after is not None:
+            self.send_header("Retry-After", server.retry_after)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PriceChunkTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = ResponseCache(os.path.join(directory.name, "cache.sqlite3"))
+        self.addCleanup(lambda: cache._connection and cache._connection.close())
+        original_cache, original_url = price_lookup.RESPONSE_CACHE, price_lookup.STEAM_STORE_URL
+        price_lookup.RESPONSE_CACHE = cache
+        self.addCleanup(setattr, price_lookup, "RESPONSE_CACHE", original_cache)
+        self.addCleanup(setattr, price_lookup, "STEAM_STORE_URL", original_url)
+
+    def start_server(self, **kwargs):
+        server = PriceServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        price_lookup.STEAM_STORE_URL = server.url
+        return server
+
+    def test_only_missing_ids_are_fetched_one_by_one(self):
+        server = self.start_server(missing={"2", "3"})
+        results = price_lookup.fetch_price_chunk([1, 2, 3, 4], "us")
+        self.assertEqual(results, {game_id: (float(game_id), "USD", True) for game_id in (1, 2, 3, 4)})
+        self.assertEqual(sorted(server.requests), [["1", "2", "3", "4"], ["2"], ["3"]])
+
+    def test_malformed_answer_falls_back_per_id(self):
+        server = self.start_server(malformed=True)
+        results = price_lookup.fetch_price_chunk([5, 6], "us")
+        self.assertEqual(results, {5: (5.0, "USD", True), 6: (6.0, "USD", True)})
+        self.assertEqual(sorted(server.requests), [["5"], ["5", "6"], ["6"]])
+
+    def test_429_is_retried_after_retry_after(self):
+        server = self.start_server(statuses=[429])
+        results = price_lookup.fetch_price_chunk([7, 8], "us")
+        self.assertEqual(results, {7: (7.0, "USD", True), 8: (8.0, "USD", True)})
+        self.assertEqual(server.requests, [["7", "8"], ["7", "8"]])
+
+    def test_429_without_retry_after_fails_the_chunk(self):
+        server = self.start_server(statuses=[429], retry_after=None)
+        results = price_lookup.fetch_price_chunk([7, 8], "us")
+        self.assertEqual(results, {7: (0, "USD", False), 8: (0, "USD", False)})
+        self.assertEqual(server.requests, [["7", "8"]])
+
+    def test_persistent_server_errors_fail_the_chunk(self):
+        server = self.start_server(statuses=[503] * 10)
+        original_retries = price_lookup.PRICE_MAX_RETRIES
+        price_lookup.PRICE_MAX_RETRIES = 0
+        self.addCleanup(setattr, price_lookup, "PRICE_MAX_RETRIES", original_retries)
+        results = price_lookup.fetch_price_chunk([9, 10, 11], "us")
+        self.assertEqual(results, {game_id: (0, "USD", False) for game_id in (9, 10, 11)})
+        self.assertEqual(server.requests, [["9", "10", "11"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SteamAPI"))
+
+from response_cache import ResponseCache
+
+
+class SharedSizeTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.sqlite3")
+
+    def open_cache(self, **kwargs):
+        cache = ResponseCache(self.path, **kwargs)
+        self.addCleanup(lambda: cache._connection and cache._connection.close())
+        return cache
+
+    def stored_size(self):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def test_limit_holds_for_caches_sharing_a_file(self):
+        # Two connections to the same file, like the crawler and the bot
+        crawler = self.open_cache(max_bytes=20000)
+        bot = self.open_cache(max_bytes=20000)
+        for i in range(60):
+            crawler.set("appdetails", f"crawler-{i}", {"payload": "x" * 1000})
+            bot.set("appdetails", f"bot-{i}", {"payload": "x" * 1000})
+        self.assertLessEqual(self.stored_size(), 20000)
+        self.assertEqual(bot.stats()["size_bytes"], self.stored_size())
+
+    def test_replaced_entries_count_once(self):
+        cache = self.open_cache()
+        cache.set("appdetails", 1, {"payload": "x" * 100})
+        cache.set("appdetails", 1, {"payload": "x" * 10})
+        self.assertEqual(cache.stats()["size_bytes"], self.stored_size())
+
+    def test_size_of_an_existing_file_is_counted(self):
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE responses (key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload TEXT NOT NULL, "
+                "size INTEGER NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("INSERT INTO responses VALUES ('old', 'appdetails', '{}', 500, 0, 0)")
+        connection.close()
+        cache = self.open_cache()
+        cache.set("appdetails", 2, {})
+        self.assertEqual(cache.stats()["size_bytes"], 502)
+
+
+if __name__ == "__main__":
+    unittest.main()
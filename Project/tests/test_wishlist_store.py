@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SteamAPI"))
+
+from wishlist_store import CachedWishlistStore, SqliteWishlistStore
+
+
+# SQLite store recording the writes the cache replays on it
+class RecordingStore(SqliteWishlistStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.calls = []
+
+    def replace(self, user_id, wishlist):
+        self.calls.append(("replace", user_id, [game["ID"] for game in wishlist]))
+        super().replace(user_id, wishlist)
+
+    def extend(self, user_id, games):
+        self.calls.append(("extend", user_id, [game["ID"] for game in games]))
+        return super().extend(user_id, games)
+
+    def remove_by_name(self, user_id, game_name):
+        self.calls.append(("remove", user_id, game_name))
+        return super().remove_by_name(user_id, game_name)
+
+
+def game(game_id):
+    return {"ID": game_id, "Name": f"Game {game_id}", "Price": "$1.00"}
+
+
+class CachedWishlistStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = RecordingStore(os.path.join(directory.name, "wishlists.sqlite3"))
+        self.addCleanup(lambda: self.store._connection and self.store._connection.close())
+
+    def open_cache(self, max_entries=8):
+        # Flushed by the tests themselves, the timer never fires
+        cache = CachedWishlistStore(self.store, max_entries=max_entries, flush_interval=3600)
+        self.addCleanup(lambda: cache._timer and cache._timer.cancel())
+        return cache
+
+    def stored_ids(self, user_id):
+        return [stored["ID"] for stored in self.store.read(user_id)]
+
+    def test_changes_are_replayed_in_order(self):
+        cache = self.open_cache()
+        cache.add(1, game(10))
+        cache.add(1, game(11))
+        cache.remove_by_name(1, "Game 10")
+        cache.add(1, game(12))
+        self.assertEqual(self.store.calls, [])
+        cache.flush()
+        self.assertEqual(self.store.calls, [("extend", "1", [10, 11]), ("remove", "1", "Game 10"),
+                                            ("extend", "1", [12])])
+        self.assertEqual(self.stored_ids(1), [11, 12])
+        self.assertEqual(cache.stats()["dirty"], 0)
+
+    def test_replace_supersedes_earlier_changes(self):
+        cache = self.open_cache()
+        cache.add(1, game(10))
+        cache.remove_by_name(1, "Game 10")
+        cache.replace(1, [game(20), game(21)])
+        cache.add(1, game(22))
+        cache.flush()
+        self.assertEqual(self.store.calls, [("replace", "1", [20, 21]), ("extend", "1", [22])])
+        self.assertEqual(self.stored_ids(1), [20, 21, 22])
+
+    def test_duplicates_are_not_written(self):
+        cache = self.open_cache()
+        self.assertTrue(cache.add(1, game(10)))
+        self.assertFalse(cache.add(1, game(10)))
+        self.assertEqual(cache.extend(1, [game(10), game(11)]), 1)
+        cache.flush()
+        self.assertEqual(self.store.calls, [("extend", "1", [10, 11])])
+
+    def test_evicted_wishlist_is_written_and_its_lock_dropped(self):
+        cache = self.open_cache(max_entries=2)
+        cache.add(1, game(10))
+        cache.add(2, game(20))
+        cache.add(3, game(30))
+        self.assertEqual(list(cache._entries), ["2", "3"])
+        self.assertNotIn("1", cache._user_locks)
+        self.assertEqual(self.store.calls, [("extend", "1", [10])])
+        self.assertEqual(self.stored_ids(1), [10])
+        # Read back from the store on the next use
+        reads = cache.stats()["disk_reads"]
+        self.assertEqual([stored["ID"] for stored in cache.read(1)], [10])
+        self.assertEqual(cache.stats()["disk_reads"], reads + 1)
+
+    def test_busy_user_is_not_evicted(self):
+        cache = self.open_cache(max_entries=2)
+        cache.add(1, game(10))
+        cache.add(2, game(20))
+        holding = threading.Event()
+        release = threading.Event()
+
+        def hold_first_user():
+            with cache._locked("1"):
+                holding.set()
+                release.wait(10)
+
+        thread = threading.Thread(target=hold_first_user)
+        thread.start()
+        holding.wait(10)
+        try:
+            cache.add(3, game(30))
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(list(cache._entries), ["1", "3"])
+        self.assertEqual(self.store.calls, [("extend", "2", [20])])
+        cache.flush()
+        self.assertEqual(self.stored_ids(1), [10])
+        self.assertEqual(self.stored_ids(3), [30])
+
+
+if __name__ == "__main__":
+    unittest.main()